@@ -0,0 +1,84 @@
+"""
+Compare the Redis value codec (msgpack, zstd above the threshold) against JSON
+for the values the bot caches: size in bytes and encode/decode time.
+
+Run from the ``source`` directory:
+
+    python -m benchmarks.bench_codec
+"""
+import json
+import timeit
+from dataclasses import asdict
+from datetime import datetime
+
+from src.library.codec import Codec
+from src.types.models import User, Ticket, TicketMessage
+from src.types.data_store import RoleEntry, Transcript
+
+
+NUMBER = 20_000
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "__dataclass_fields__"):
+        return asdict(value)
+    return vars(value)
+
+
+def _message(index: int) -> TicketMessage:
+    return TicketMessage(
+        id=index,
+        ticket_id="0123456789abcdef",
+        user_id=123456789,
+        message_id=1000 + index,
+        message_chat_id=-1001234567890,
+        username="luffy",
+        userfullname="Monkey D. Luffy",
+        message="My order has not arrived yet, could you check the shipment status please?",
+        message_from="user",
+        timestamp=datetime(2024, 1, 1, 10, index % 60)
+    )
+
+
+CASES = {
+    "role_entry": RoleEntry(role_id=2, user_id=123456789, username="luffy"),
+    "user": User(
+        id=123456789, role_id=1, is_bot=False, first_name="Monkey", username="luffy",
+        last_name="D. Luffy", is_active=True, created_at=datetime(2024, 1, 1, 9, 0)
+    ),
+    "ticket": Ticket(
+        ticket_id="0123456789abcdef", user_id=123456789, message_id=1000, message_chat_id=-1001234567890,
+        username="luffy", userfullname="Monkey D. Luffy", issue="My order has not arrived yet.",
+        created_at=datetime(2024, 1, 1, 10, 0), status="closed", handler_id=987654321,
+        handler_username="zoro", closed_at=datetime(2024, 1, 1, 11, 0)
+    ),
+    "transcript_50": Transcript(pending=[_message(index) for index in range(50)]),
+}
+
+
+def main():
+    codec = Codec()
+    for model in (User, Ticket, TicketMessage, RoleEntry, Transcript):
+        codec.register(model)
+
+    print(f"{NUMBER} round trips per case")
+    for name, value in CASES.items():
+        encoded_json = json.dumps(value, default=_json_default).encode()
+        encoded = codec.encode(value)
+        assert type(codec.decode(encoded)) is type(value)
+
+        json_encode = timeit.timeit(lambda: json.dumps(value, default=_json_default).encode(), number=NUMBER)
+        json_decode = timeit.timeit(lambda: json.loads(encoded_json), number=NUMBER)
+        codec_encode = timeit.timeit(lambda: codec.encode(value), number=NUMBER)
+        codec_decode = timeit.timeit(lambda: codec.decode(encoded), number=NUMBER)
+
+        print(
+            f"  {name:<14} json {len(encoded_json):>6}B enc {json_encode:.3f}s dec {json_decode:.3f}s"
+            f" | codec {len(encoded):>6}B enc {codec_encode:.3f}s dec {codec_decode:.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
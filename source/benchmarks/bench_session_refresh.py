@@ -0,0 +1,98 @@
+"""
+Count the Redis writes made by ticket-session refreshes for a replayed chat
+workload, refreshing on every message (fraction 1.0) against the debounced
+refresh at a few thresholds.
+
+Needs a ``config.yml`` like the bot itself. Run from the ``source`` directory:
+
+    python -m benchmarks.bench_session_refresh
+"""
+import asyncio
+import random
+from types import SimpleNamespace
+
+from src.library import cache
+from src.handlers.tickets import HandlerTickets
+
+
+SESSION_TTL = 86400
+TICKETS = 500
+FRACTIONS = (1.0, 0.99, 0.95, 0.9)
+
+
+class Clock:
+    """Virtual monotonic clock, so a day of traffic replays instantly."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class CountingPipeline:
+    def __init__(self, counter: dict):
+        self.counter = counter
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, *args, **kwargs):
+        self.counter["commands"] += 1
+
+    def zadd(self, *args, **kwargs):
+        self.counter["commands"] += 1
+
+    async def execute(self):
+        self.counter["round_trips"] += 1
+
+
+def workload(seed: int = 7):
+    """(time, ticket_id) of every message: bursts of replies spread over a working day."""
+    rng = random.Random(seed)
+    events = []
+    for ticket in range(TICKETS):
+        at = rng.uniform(0, 8 * 3600)
+        for _ in range(rng.randint(1, 6)):
+            for _ in range(rng.randint(2, 15)):
+                at += rng.expovariate(1 / 45)
+                events.append((at, f"ticket-{ticket}"))
+            at += rng.uniform(600, 3 * 3600)
+    return sorted(events)
+
+
+async def replay(fraction: float, events) -> dict:
+    clock = Clock()
+    cache.time = SimpleNamespace(monotonic=clock.monotonic)
+    counter = {"commands": 0, "round_trips": 0}
+
+    tickets = HandlerTickets()
+    redis = SimpleNamespace(client=SimpleNamespace(pipeline=lambda transaction=False: CountingPipeline(counter)))
+    tickets.redis = redis
+    tickets.session_ttl = SESSION_TTL
+    tickets.session_refresh_fraction = fraction
+
+    for at, ticket_id in events:
+        clock.now = at
+        await tickets._update_ticket_session(ticket_id)
+    return {**counter, **tickets.session_counters}
+
+
+async def main():
+    events = workload()
+    print(f"{len(events)} messages on {TICKETS} tickets, session TTL {SESSION_TTL}s\n")
+    print(f"{'fraction':>8} {'round trips':>12} {'commands':>9} {'skipped':>8} {'max early close':>16}")
+    for fraction in FRACTIONS:
+        result = await replay(fraction, events)
+        early = SESSION_TTL * (1 - fraction)
+        print(
+            f"{fraction:>8} {result['round_trips']:>12} {result['commands']:>9} "
+            f"{result['skipped']:>8} {early / 60:>14.0f}m"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+"""
+Compare rendering the message templates with ``str.format`` on the raw YAML
+strings against the precompiled templates.
+
+Run from the ``source`` directory:
+
+    python -m benchmarks.bench_templates
+"""
+import timeit
+
+from src.localization.template import template
+
+
+BOT_NAME = "Vegapunk Edison - Bot Ticketing"
+NUMBER = 200_000
+
+CASES = {
+    "template_help": dict(bot_name=BOT_NAME),
+    "custom_welcome_message": dict(bot_name=BOT_NAME),
+    "template_admin_only": dict(),
+    "reply_message_private": dict(ticket_id="0123456789abcdef", bot_name=BOT_NAME),
+    "template_ticket_message": dict(
+        ticket_id="0123456789abcdef",
+        user_name="Monkey D. Luffy",
+        username="luffy",
+        timestamp="Monday, 01 January 2024 10:00:00",
+        message="My order has not arrived yet."
+    ),
+}
+
+
+def main():
+    for lang in ("id", "en"):
+        compiled = template(lang, bot_name=BOT_NAME).messages
+        print(f"[{lang}] {NUMBER} renders per case")
+
+        for name, kwargs in CASES.items():
+            compiled_template = getattr(compiled, name)
+            raw_template = str(compiled_template)
+            assert raw_template.format(**kwargs) == compiled_template.render(**kwargs)
+
+            raw = timeit.timeit(lambda: raw_template.format(**kwargs), number=NUMBER)
+            fast = timeit.timeit(lambda: compiled_template.render(**kwargs), number=NUMBER)
+            kind = "static" if compiled_template.static is not None else "dynamic"
+            print(f"  {name:<28} {kind:<8} str.format {raw:.3f}s  compiled {fast:.3f}s  ({raw / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
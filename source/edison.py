@@ -1,18 +1,18 @@
+import time
 import asyncio
 
 from loguru import logger
 from aiohttp import ClientSession
 from typing import Optional, List
 from telebot.handler_backends import State, StatesGroup
-from telebot.async_telebot import AsyncTeleBot
-from telebot.storage import StateMemoryStorage
+from telebot.asyncio_storage import StateMemoryStorage, StateStorageBase
 from telebot import asyncio_helper
 
 from src.utility.const import COMMANDS, TIME_RANGES
 from src.localization.config import config
 from src.localization.template import template
 from src.utility.utility import invalid_command
-from src.controller.store import Store
+from src.controller.album import AlbumAssembler
 from src.types.tickets import MessageFrom
 from src.handlers.messages import HandlerMessages
 from src.handlers.tickets import HandlerTickets
@@ -21,6 +21,13 @@ from src.utility.formatter import MarkdownFormatter
 from src.controller.issue_generator import IssueGenerator
 from src.library.database import Model
 from src.library.redis import BtRedis
+from src.library.sender import RateLimitedSender
+from src.library.ratelimit import RateLimiter
+from src.library.leader import LeaderElection
+from src.library.state_storage import BtRedisStateStorage
+from src.library.bot import BtTeleBot
+from src.library.dedup import UpdateDeduplicator
+from src.library.webhook import WebhookServer
 
 
 class BotTicketing(HandlerMessages):
@@ -31,31 +38,59 @@ class BotTicketing(HandlerMessages):
 
         self.logger.info(f"Initializing {self.config.bot.name}")
 
-        self.template = template(self.config.bot.lang)
+        self.template = template(self.config.bot.lang, bot_name=self.config.bot.name)
         self.logger.info(f"Template loaded with language: {self.config.bot.lang}")
 
-        self.telebot: AsyncTeleBot = AsyncTeleBot(
+        # Redis Initialization
+        self.redis = BtRedis(self.config.redis)
+
+        # Redelivered updates are dropped before any handler runs
+        deduplicator = None
+        if self.config.telegram.dedup_ttl > 0:
+            deduplicator = UpdateDeduplicator(self.redis, ttl=self.config.telegram.dedup_ttl)
+
+        self.telebot: BtTeleBot = BtTeleBot(
             token=self.config.telegram.token, 
-            state_storage=StateMemoryStorage())
-        self.logger.info("Telegram bot initialized with state storage")
+            state_storage=self._state_storage(),
+            deduplicator=deduplicator)
+        self.logger.info(f"Telegram bot initialized with {self.config.telegram.state_storage} state storage")
         
-        self.storage: Store = Store()
+        self.albums: AlbumAssembler = AlbumAssembler(self.redis, settle=self.config.telegram.album_settle)
         self.messages: SetupMessage = SetupMessage()
         self.message_from: MessageFrom = MessageFrom()
         
-        # Redis Initialization
-        self.redis = BtRedis(self.config.redis)
-        
         self.tickets: HandlerTickets = HandlerTickets()
-        self.tickets.set_redis(self.redis, self.config.redis.session_ttl)
+        self.tickets.set_redis(
+            self.redis, self.config.redis.session_ttl, self.config.redis.session_refresh_fraction
+        )
+        self.sender: RateLimitedSender = RateLimitedSender(rate=self.config.telegram.broadcast_rate)
+        self.tickets.on_auto_closed = self._send_auto_closed_private
+        telegram = self.config.telegram
+        if telegram.mode not in ("polling", "webhook"):
+            # Polling deletes the webhook, so a typo must not fall back to it
+            raise ValueError(f"Unknown telegram.mode '{telegram.mode}', expected 'polling' or 'webhook'")
+        self.user_limiter = RateLimiter(self.redis, telegram.user_rate_limit, telegram.user_burst, "bt:rl:user")
         
         Model.db = self.tickets
         self.markdown: MarkdownFormatter = MarkdownFormatter()
         self.issue_generator: IssueGenerator = IssueGenerator()
         self.handler_admin_ids: Optional[List[str]] = []
+        self._expiry_listener: Optional[asyncio.Task] = None
+        # Periodic jobs run on one replica at a time
+        self.leader = LeaderElection(self.redis, name="bt:leader:jobs", lease=self.config.redis.leader_lease)
+        self.leader.add_job(self._auto_close_task)
 
         self._setup_handlers()
 
+    def _state_storage(self) -> StateStorageBase:
+        """Build the conversation state storage selected by ``telegram.state_storage``."""
+        kind = self.config.telegram.state_storage
+        if kind == "redis":
+            return BtRedisStateStorage(self.redis, ttl=self.config.telegram.state_ttl)
+        if kind != "memory":
+            raise ValueError(f"Unknown telegram.state_storage '{kind}', expected 'memory' or 'redis'")
+        return StateMemoryStorage()
+
     def _setup_handlers(self):
 
         @self.telebot.message_handler(commands=["help"], chat_types=["private", "group", "supergroup"])
@@ -64,7 +99,7 @@ class BotTicketing(HandlerMessages):
 
         @self.telebot.message_handler(commands=["regist"])
         async def regist_handler(message):
-            if await self.tickets.get_user_role(message.from_user.username) == 3:
+            if await self.tickets.get_user_role(message.from_user.username, message.from_user.id) == 3:
                 await self.handler_regist_user_handler(message)
             else:
                 await self._send_error_response(message, self.template.messages.template_admin_only)
@@ -72,7 +107,7 @@ class BotTicketing(HandlerMessages):
 
         @self.telebot.message_handler(commands=["deregist"])
         async def deregist_handler(message):
-            if await self.tickets.get_user_role(message.from_user.username) == 3:
+            if await self.tickets.get_user_role(message.from_user.username, message.from_user.id) == 3:
                 await self.handler_deregist_user_handler(message)
             else:
                 await self._send_error_response(message, self.template.messages.template_admin_only)
@@ -80,7 +115,7 @@ class BotTicketing(HandlerMessages):
 
         @self.telebot.message_handler(commands=["handlers"])
         async def user_handler(message):
-            if await self.tickets.get_user_role(message.from_user.username) in [2, 3]:
+            if await self.tickets.get_user_role(message.from_user.username, message.from_user.id) in [2, 3]:
                 await self.handler_get_user_handler(message)
             else:
                 await self._send_error_response(message, self.template.messages.template_admin_only)
@@ -88,7 +123,7 @@ class BotTicketing(HandlerMessages):
 
         @self.telebot.message_handler(commands=["start"])
         async def start_handler(message):
-            if await self.tickets.get_user_role(message.from_user.username) in [1, 2, 3]:
+            if await self.tickets.get_user_role(message.from_user.username, message.from_user.id) in [1, 2, 3]:
                 await self.handler_message_start(message)
             else:
                 await self._send_error_response(message, self.template.messages.template_warning_message)
@@ -97,7 +132,7 @@ class BotTicketing(HandlerMessages):
         @self.telebot.message_handler(commands=["close"], 
                                       chat_types=["group", "supergroup"])
         async def close_ticket_handler(message):
-            if await self.tickets.get_user_role(message.from_user.username) in [2, 3]:
+            if await self.tickets.get_user_role(message.from_user.username, message.from_user.id) in [2, 3]:
                 await self.handler_closed_tickets(message)
             else:
                 await self._send_error_response(message, self.template.messages.template_user_not_handler)
@@ -106,7 +141,7 @@ class BotTicketing(HandlerMessages):
         @self.telebot.message_handler(commands=["open"], 
                                       chat_types=["group", "supergroup"])
         async def open_ticket_handler(message):
-            if await self.tickets.get_user_role(message.from_user.username) in [2, 3]:
+            if await self.tickets.get_user_role(message.from_user.username, message.from_user.id) in [2, 3]:
                 await self.handler_open_tickets(message)
             else:
                 await self._send_error_response(message, self.template.messages.template_user_not_handler)
@@ -115,7 +150,7 @@ class BotTicketing(HandlerMessages):
         @self.telebot.message_handler(commands=["conversation"], 
                                       chat_types=["private", "group", "supergroup"])
         async def conversation_handler(message):
-            if await self.tickets.get_user_role(message.from_user.username) in [1, 2, 3]:
+            if await self.tickets.get_user_role(message.from_user.username, message.from_user.id) in [1, 2, 3]:
                 await self.handler_conversation(message)
             else:
                 await self._send_error_response(message, self.template.messages.template_warning_message)
@@ -124,7 +159,7 @@ class BotTicketing(HandlerMessages):
         @self.telebot.message_handler(commands=["history"], 
                                       chat_types=["private", "group", "supergroup"])
         async def history_handler(message):
-            if await self.tickets.get_user_role(message.from_user.username) in [1, 2, 3]:
+            if await self.tickets.get_user_role(message.from_user.username, message.from_user.id) in [1, 2, 3]:
                 await self.handler_history(message)
             else:
                 await self._send_error_response(message, self.template.messages.template_warning_message)
@@ -154,6 +189,8 @@ class BotTicketing(HandlerMessages):
         
         @self.telebot.message_handler(content_types=["text", "document", "photo", "video"], chat_types=["private"])
         async def handle_message_from_user(message):
+            if not await self._within_rate_limit(message, self.user_limiter, message.from_user.id):
+                return
             user_role = await self.tickets.ensure_user(
                 id=message.from_user.id,
                 is_bot=message.from_user.is_bot,
@@ -183,24 +220,119 @@ class BotTicketing(HandlerMessages):
 
     async def _auto_close_task(self):
         """
-        Background task to periodically check for expired ticket sessions.
+        Background task closing tickets as their sessions expire.
+
+        Sleeps until the next session in the expiry index is due, waking at least
+        every 5 minutes to pick up sessions indexed by other replicas. With expiry
+        notifications enabled, tickets are closed by the notification listener and
+        this only runs as an occasional reconciliation sweep. Open tickets missing from
+        the index are added back on every reconcile interval.
+
+        Runs only on the elected leader and is cancelled when leadership is lost;
+        each close is fenced with the lease of this leader's term.
         """
-        while True:
-            try:
-                self.logger.debug("Running auto-close check for expired tickets...")
-                await self.tickets.check_and_close_expired_tickets(self.config.timezone)
-            except Exception as e:
-                self.logger.error(f"Error in auto-close task: {e}")
-            
-            # Check every 5 minutes
-            await asyncio.sleep(300)
+        notifications = self.config.redis.expiry_notifications
+        if notifications:
+            self._expiry_listener = asyncio.create_task(self.redis.listen_expired(
+                "ticket_session:",
+                lambda key: self.tickets.on_session_expired(key, fence=self.leader.fence),
+                # Sweep after every (re)subscription for sessions that expired meanwhile
+                on_subscribe=lambda: self.tickets.check_and_close_expired_tickets(
+                    self.config.timezone, fence=self.leader.fence
+                )
+            ))
+
+        try:
+            indexed_at = None
+            while True:
+                # Re-index on every reconcile interval, so open tickets whose index entry was
+                # never written or was lost in Redis are still closed without a restart
+                if indexed_at is None or time.monotonic() - indexed_at >= self.config.redis.reconcile_interval:
+                    try:
+                        await self.tickets.index_ticket_sessions()
+                        indexed_at = time.monotonic()
+                    except Exception as e:
+                        self.logger.error(f"Error indexing ticket sessions: {e}")
+
+                next_due = None
+                try:
+                    if await self.leader.ensure():
+                        self.logger.debug("Running auto-close check for expired tickets...")
+                        next_due = await self.tickets.check_and_close_expired_tickets(
+                            self.config.timezone, fence=self.leader.fence
+                        )
+                    else:
+                        self.logger.warning(f"Skipping auto-close check, lease term {self.leader.token} is no longer held")
+                except Exception as e:
+                    self.logger.error(f"Error in auto-close task: {e}")
+
+                if notifications:
+                    await asyncio.sleep(self.config.redis.reconcile_interval)
+                else:
+                    await asyncio.sleep(min(max(next_due, 1.0), 300) if next_due is not None else 300)
+        finally:
+            if self._expiry_listener:
+                self._expiry_listener.cancel()
+                self._expiry_listener = None
+
+    async def _warm_up(self):
+        """Warm the caches before the first updates arrive, giving up at the configured deadline."""
+        started = time.monotonic()
+        timeout = self.config.bot.warmup_timeout
+        try:
+            warmed = await asyncio.wait_for(self.tickets.warm_caches(), timeout=timeout)
+            logger.info(f"Caches warmed in {time.monotonic() - started:.2f}s: {warmed}")
+        except asyncio.TimeoutError:
+            logger.warning(f"Cache warm-up hit its {timeout}s deadline, starting with partly cold caches")
+        except Exception as e:
+            logger.warning(f"Cache warm-up failed after {time.monotonic() - started:.2f}s, starting with cold caches: {e}")
+
+    async def _serve_webhook(self):
+        """
+        Receive updates through the webhook server until cancelled.
+
+        Every replica registers the same webhook URL, which is idempotent, and updates
+        queued while the bot was down are kept rather than dropped.
+        """
+        telegram = self.config.telegram
+        if not telegram.webhook_url or not telegram.webhook_secret:
+            raise ValueError("Webhook mode needs telegram.webhook_url and telegram.webhook_secret")
+
+        server = WebhookServer(
+            self.telebot,
+            secret_token=telegram.webhook_secret,
+            host=telegram.webhook_host,
+            port=telegram.webhook_port,
+            path=telegram.webhook_path,
+            queue_size=telegram.webhook_queue_size,
+            workers=telegram.webhook_workers
+        )
+        await server.start()
+        try:
+            await self.telebot.set_webhook(
+                url=telegram.webhook_url,
+                secret_token=telegram.webhook_secret,
+                drop_pending_updates=False
+            )
+            self.logger.info(f"Receiving updates through the webhook at {telegram.webhook_url}")
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    async def _stop_election(self, election: Optional[asyncio.Task]):
+        """Stop campaigning and release the lease so another replica takes over right away."""
+        if election:
+            election.cancel()
+            await asyncio.gather(election, return_exceptions=True)
 
     async def start_polling(self):
+        election: Optional[asyncio.Task] = None
         async with ClientSession() as session:
             asyncio_helper.session = session
             try:
                 # Connect to Redis
                 await self.redis.connect()
+                await self.tickets.cache.start()
                 
                 await self.tickets.setup_tables(
                     database=self.config.database.database
@@ -209,21 +341,33 @@ class BotTicketing(HandlerMessages):
                 # Initialize admins from config
                 await self.tickets.initialize_admins(self.config.telegram.admin_ids)
                 
-                # Start auto-close background task
-                asyncio.create_task(self._auto_close_task())
-                
-                await self.telebot.delete_webhook(drop_pending_updates=True)
+                # Campaign for leadership; the leader runs the auto-close task
+                election = asyncio.create_task(self.leader.run())
                 
-                await self.telebot.infinity_polling(
-                    timeout=10, 
-                    request_timeout=60
-                )
+                if self.config.telegram.mode == "webhook":
+                    await self._warm_up()
+                    await self._serve_webhook()
+                else:
+                    # Warm the caches while the webhook is dropped; poll only once both are done
+                    await asyncio.gather(
+                        self._warm_up(),
+                        self.telebot.delete_webhook(drop_pending_updates=True)
+                    )
+                    
+                    await self.telebot.infinity_polling(
+                        timeout=10, 
+                        request_timeout=60
+                    )
             except KeyboardInterrupt:
                 logger.info("Polling interrupted by user. Shutting down gracefully...")
                 await self.telebot.close()
+                await self.tickets.cache.stop()
+                await self._stop_election(election)
                 await self.redis.disconnect()
                 await asyncio.sleep(1)
             except Exception as e:
                 logger.error(f"Polling error: {e}", exc_info=True)
+                await self.tickets.cache.stop()
+                await self._stop_election(election)
                 await self.redis.disconnect()
                 raise
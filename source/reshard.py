@@ -0,0 +1,35 @@
+import asyncio
+import argparse
+
+from loguru import logger
+from src.handlers.tickets import HandlerTickets
+
+
+async def reshard(batch_size: int, dry_run: bool, from_primary: bool) -> None:
+    tickets = HandlerTickets()
+    if not tickets.shards:
+        logger.error("No shards configured under database.shards in config.yml")
+        return
+
+    try:
+        moved = await tickets.shards.rebalance(
+            batch_size=batch_size,
+            dry_run=dry_run,
+            legacy=tickets if from_primary else None
+        )
+        logger.info(f"{'Would move' if dry_run else 'Moved'} {moved} users")
+    finally:
+        await tickets.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move ticket data to the shard each user hashes to.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Users moved per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many users would move")
+    parser.add_argument("--from-primary", action="store_true", 
+                        help="Also move tickets stored on the primary database before sharding was enabled")
+    args = parser.parse_args()
+    asyncio.run(reshard(args.batch_size, args.dry_run, args.from_primary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import asyncio
+from loguru import logger
+from typing import List, Optional, Set
+from telebot.types import Message, InputMediaDocument, InputMediaPhoto, InputMediaVideo
+
+from src.library.redis import BtRedis
+from src.types.data_store import Album
+
+
+class AlbumAssembler:
+    """
+    Collects the parts of a Telegram album (media group) across every bot worker.
+
+    Each part is appended to a Redis list keyed by ``media_group_id`` and resets a short
+    quiet timer. Once no part has arrived for ``settle`` seconds the album is complete;
+    every worker that received a part then takes the list with one ``LRANGE`` + ``DEL``
+    transaction, so only the first gets the parts and each part is forwarded and stored
+    exactly once. A part arriving after the album was taken starts a new list and is
+    collected the same way, as a follow-up album. All keys expire on their own.
+    """
+
+    def __init__(self, redis: BtRedis, settle: float = 1.0, ttl: int = 300, prefix: str = "bt:album"):
+        """Initialize the assembler.
+
+        Args:
+            redis: Redis wrapper holding the album parts
+            settle: Seconds without a new part after which an album counts as complete
+            ttl: Seconds the parts, and the marker of a taken album, are kept
+            prefix: Prefix of the album keys
+        """
+        self.redis = redis
+        self.settle = settle
+        self.ttl = ttl
+        self.prefix = prefix
+        self.logger = logger
+        self._collecting: Set[str] = set()
+
+    def _key(self, media_group_id: str, suffix: str = "parts") -> str:
+        return f"{self.prefix}:{media_group_id}:{suffix}"
+
+    async def add(self, media_group_id: str, message: Message) -> bool:
+        """
+        Store one part of an album.
+
+        Returns:
+            True when this worker is not collecting the album yet and should call ``collect``.
+        """
+        media_group_id = str(media_group_id)
+        async with self.redis.raw.pipeline(transaction=True) as pipe:
+            pipe.rpush(self._key(media_group_id), self.redis.codec.encode(message.json))
+            pipe.expire(self._key(media_group_id), self.ttl)
+            pipe.set(self._key(media_group_id, "quiet"), 1, px=int(self.settle * 1000))
+            await pipe.execute()
+
+        if media_group_id in self._collecting:
+            return False
+        self._collecting.add(media_group_id)
+        return True
+
+    async def collect(self, media_group_id: str) -> Optional[Album]:
+        """
+        Wait until the album stops growing and take its parts.
+
+        Returns:
+            The album when this worker took its parts, otherwise None.
+        """
+        media_group_id = str(media_group_id)
+        try:
+            quiet_key = self._key(media_group_id, "quiet")
+            await asyncio.sleep(self.settle)
+            while (remaining := await self.redis.client.pttl(quiet_key)) > 0:
+                await asyncio.sleep(remaining / 1000)
+        finally:
+            # From here a new part must start its own collection; until the take below
+            # it is still included in this one
+            self._collecting.discard(media_group_id)
+
+        taken_key = self._key(media_group_id, "taken")
+        async with self.redis.raw.pipeline(transaction=True) as pipe:
+            pipe.lrange(self._key(media_group_id), 0, -1)
+            pipe.delete(self._key(media_group_id), quiet_key)
+            pipe.exists(taken_key)
+            pipe.set(taken_key, 1, ex=self.ttl)
+            parts, _, taken_before, _ = await pipe.execute()
+        if not parts:
+            # Another worker took the album first
+            return None
+        if taken_before:
+            self.logger.info(f"Forwarding {len(parts)} late part(s) of media group {media_group_id} as a follow-up")
+
+        # Parts can arrive out of order, and twice when Telegram redelivers an update
+        messages = {}
+        for part in parts:
+            message = Message.de_json(self.redis.codec.decode(part))
+            messages[message.message_id] = message
+
+        ordered = [messages[message_id] for message_id in sorted(messages)]
+        return Album(media_group_id=media_group_id, messages=ordered, medias=self._medias(ordered))
+
+    @staticmethod
+    def _medias(messages: List[Message]) -> list:
+        medias = []
+        for message in messages:
+            if message.photo:
+                medias.append(InputMediaPhoto(media=message.photo[-1].file_id))
+            elif message.video:
+                medias.append(InputMediaVideo(media=message.video.file_id))
+            elif message.document:
+                medias.append(InputMediaDocument(media=message.document.file_id))
+        return medias
@@ -2,6 +2,8 @@ from typing import Dict, List, Any, Literal
 from src.utility.utility import arson, reltime
 from src.types.messages import Messages
 from src.types.models import Ticket, Handler, TicketMessage
+from src.types.data_store import Transcript
+from src.localization.template import CompiledTemplate
 
 
 class SetupMessage:
@@ -12,6 +14,13 @@ class SetupMessage:
     def _create_message(content: str, parse_mode: Literal["HTML", "Markdown"]) -> Messages:
         """Create message for telegram bot ticketing"""
         return Messages(**arson(text=content, parse_mode=parse_mode))
+
+    @staticmethod
+    def _render(text: str, **kwargs) -> str:
+        """Render a template, using its precompiled form when available"""
+        if isinstance(text, CompiledTemplate):
+            return text.render(**kwargs)
+        return text.format(**kwargs)
     
     def privcommon(self, content: str) -> Messages:
         return self._create_message(content, "Markdown")
@@ -19,7 +28,7 @@ class SetupMessage:
     def groupcommon(self, content: str, **kwargs) -> Messages:
         if not kwargs:
             return self._create_message(content, "Markdown")
-        return self._create_message(content.format(**kwargs), "Markdown")
+        return self._create_message(self._render(content, **kwargs), "Markdown")
     
     def open(self, opened_tickets: List[Ticket], template1: str, template2: str, **kwargs) -> Messages:
         func = kwargs.get("func")
@@ -46,22 +55,24 @@ class SetupMessage:
         return self._create_message(content, "Markdown")
 
     def replay_message(self, text: str, **kwargs) -> Messages:
-        content: str = text.format(**kwargs)
+        content: str = self._render(text, **kwargs)
         return self._create_message(content, "Markdown")
     
     def reply_message_group(self, text: str, **kwargs) -> Messages:
-        content: str = text.format(**kwargs)
+        content: str = self._render(text, **kwargs)
         return self._create_message(content, "Markdown")
     
-    def conversation_message(self, template: str, content_template: str, **kwargs):
-        contents = kwargs.get("contents")
-        ticket_id = kwargs.get("ticket_id")
-        func = kwargs.get("func")
-        
-        conversation = "\n"
+    def render_transcript(self, content_template: str, transcript: Transcript, func) -> Transcript:
+        """
+        Fold the pending messages of a transcript into its rendered text.
+
+        Only the messages added since the last render are formatted. The given transcript
+        is left untouched, the folded copy is returned.
+        """
+        conversation = ""
         space = (' ' * 4)
 
-        for content in contents:
+        for content in transcript.pending:
             content_message = content.message if len(content.message) < 100 \
                 else content.message[:100] + "..."
             
@@ -72,8 +83,16 @@ class SetupMessage:
                 message=func(content_message),
                 timestamp=content.timestamp
             )
-        
-        full_content = template.format(ticket_id=ticket_id, conversation=conversation)
+
+        return Transcript(
+            text=transcript.text + conversation,
+            count=transcript.count + len(transcript.pending),
+            last_id=transcript.pending[-1].id if transcript.pending else transcript.last_id
+        )
+
+    def conversation_message(self, template: str, transcript: Transcript, ticket_id: str):
+        """Render a ticket conversation from a transcript folded by ``render_transcript``."""
+        full_content = template.format(ticket_id=ticket_id, conversation="\n" + transcript.text)
         return self._create_message(full_content, "Markdown")
 
 
@@ -0,0 +1,27 @@
+from typing import Dict, Iterable, Tuple
+
+from src.types.models import User
+
+
+class HandlerRoster:
+    """
+    Snapshot of the users holding the handler role.
+
+    Built from the users table and cached in the ``roster`` namespace of the ticket
+    cache, so membership checks and ``/handlers`` never have to query MySQL. Code paths
+    that grant or revoke the role invalidate it on every replica instead of editing it.
+    """
+
+    def __init__(self, handlers: Iterable[User] = ()):
+        self._handlers: Dict[int, User] = {int(handler.id): handler for handler in handlers}
+        self._snapshot: Tuple[User, ...] = tuple(self._handlers[user_id] for user_id in sorted(self._handlers))
+
+    def __len__(self) -> int:
+        return len(self._handlers)
+
+    def __contains__(self, user_id: int) -> bool:
+        return int(user_id) in self._handlers
+
+    def snapshot(self) -> Tuple[User, ...]:
+        """Handlers ordered by user ID."""
+        return self._snapshot
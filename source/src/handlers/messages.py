@@ -25,7 +25,8 @@ from src.utility.const import (
 from src.types.config import Config
 from src.types.template import Template
 from src.types.tickets import MessageFrom
-from src.types.data_store import MessagesStore, MediaStores
+from src.types.data_store import Album
+from src.types.models import Ticket
 from src.types.messages import (
     Messages, 
     MessageJson, 
@@ -34,12 +35,14 @@ from src.types.messages import (
     MessageJsonVideo
 )
 from src.utility.formatter import MarkdownFormatter, FormattingEntity
-from src.utility.utility import generate_id, epodate, chakey, arson, search
+from src.utility.utility import generate_id, epodate, chakey, search, time_period
 from src.utility.markup import keyboard_markup
 from src.handlers.tickets import HandlerTickets
 from src.controller.issue_generator import IssueGenerator
 from src.controller.message import SetupMessage
-from src.controller.store import Store
+from src.controller.album import AlbumAssembler
+from src.library.sender import RateLimitedSender
+from src.library.ratelimit import RateLimiter
 
 
 class HandlerMessages:
@@ -49,7 +52,7 @@ class HandlerMessages:
     def __init__(self):
         self.logger = logger
         self.config: Optional[Config] = None
-        self.storage: Optional[Store] = None
+        self.albums: Optional[AlbumAssembler] = None
         self.template: Optional[Template] = None
         self.telebot: Optional[AsyncTeleBot] = None
         self.messages: Optional[SetupMessage] = None
@@ -57,6 +60,7 @@ class HandlerMessages:
         self.markdown: Optional[MarkdownFormatter] = None
         self.issue_generator: Optional[IssueGenerator] = None
         self.message_from: Optional[MessageFrom] = None
+        self.sender: Optional[RateLimitedSender] = None
 
     async def _send_message(self, chat_id: Union[int, str], message_obj: Messages, 
                            message_type: str = "text", media_id: str = None) -> Message:
@@ -249,13 +253,14 @@ class HandlerMessages:
         
         return "..."
     
-    async def _send_to_group(self, ticket_id: int, message: Message) -> None:
+    async def _send_to_group(self, ticket_id: int, message: Message, medias: Optional[list] = None) -> None:
         """
         Forward a message to the support group.
         
         Args:
             ticket_id: The ticket ID associated with the message
             message: The message to forward
+            medias: Media of the album the message belongs to, sent as one group
         
         Returns:
             None
@@ -321,59 +326,19 @@ class HandlerMessages:
                     reply_to_message=reply_to_message_text_non_format
                 )
             
-            if getattr(message, 'media_group_id', None):
-                media_group_id = self.storage.temp.get("media_group_id")
-
-                if hasattr(message, 'photo') and message.photo:
-                    media_store = self.storage.temp.get(f"photo_{media_group_id}")
-                    
-                    if media_store and hasattr(media_store, 'medias'):
-                        try:
-                            msg: Message = await self._sender_message_media_group_reply(
-                                chat_id=self.config.telegram.chat_id, 
-                                medias=media_store.medias, 
-                                initial_message=initial_message_format
-                            )
-                        except:
-                            msg: Message = await self._sender_message_media_group_reply(
-                                chat_id=self.config.telegram.chat_id, 
-                                medias=media_store.medias, 
-                                initial_message=initial_message_non_format
-                            )
-                
-                elif hasattr(message, 'video') and message.video:
-                    media_store = self.storage.temp.get(f"video_{media_group_id}")
-                    
-                    if media_store and hasattr(media_store, 'medias'):
-                        try:
-                            msg: Message = await self._sender_message_media_group_reply(
-                                chat_id=self.config.telegram.chat_id, 
-                                medias=media_store.medias, 
-                                initial_message=initial_message_format
-                            )
-                        except:
-                            msg: Message = await self._sender_message_media_group_reply(
-                                chat_id=self.config.telegram.chat_id, 
-                                medias=media_store.medias, 
-                                initial_message=initial_message_non_format
-                            )
-
-                elif hasattr(message, 'document') and message.document:
-                    media_store = self.storage.temp.get(f"document_{media_group_id}")
-                    
-                    if media_store and hasattr(media_store, 'medias'):
-                        try:
-                            msg: Message = await self._sender_message_media_group_reply(
-                                chat_id=self.config.telegram.chat_id, 
-                                medias=media_store.medias, 
-                                initial_message=initial_message_format
-                            )
-                        except:
-                            msg: Message = await self._sender_message_media_group_reply(
-                                chat_id=self.config.telegram.chat_id, 
-                                medias=media_store.medias, 
-                                initial_message=initial_message_non_format
-                            )
+            if medias:
+                try:
+                    msg: Message = await self._sender_message_media_group_reply(
+                        chat_id=self.config.telegram.chat_id, 
+                        medias=medias, 
+                        initial_message=initial_message_format
+                    )
+                except:
+                    msg: Message = await self._sender_message_media_group_reply(
+                        chat_id=self.config.telegram.chat_id, 
+                        medias=medias, 
+                        initial_message=initial_message_non_format
+                    )
                         
             else:
                 try:
@@ -393,7 +358,9 @@ class HandlerMessages:
             self.logger.error(f"Error sending to group: {e}")
     
 
-    async def _send_to_private(self, message: Message, ticket_id: str, from_group: bool = False, username: str = None) -> Message:
+    async def _send_to_private(self, message: Message, ticket_id: str, from_group: bool = False, 
+                               username: str = None, user_id: Optional[int] = None,
+                               medias: Optional[list] = None) -> Message:
         """
         Send a message to a private chat.
 
@@ -401,6 +368,8 @@ class HandlerMessages:
             message (Message): The message object to send.
             from_group (bool, optional): Whether the message is from a group. Defaults to False.
             username (str, optional): The target username. Defaults to None.
+            user_id (int, optional): The target user ID when it is already known. Defaults to None.
+            medias (list, optional): Media of the album the message belongs to. Defaults to None.
 
         Returns:
             Message: The sent message object.
@@ -420,39 +389,18 @@ class HandlerMessages:
             timestamp=timestamp
         )
         message_from_user_id = message.from_user.id
-        if from_group:
+        if from_group and user_id is not None:
+            message_from_user_id = user_id
+        elif from_group:
             message_from_user_id = await self.tickets.get_userid_by_username(username)
             message_from_user_id = message_from_user_id.get("id") if message_from_user_id else None
 
-        if getattr(message, 'media_group_id', None):
-            media_group_id = self.storage.temp.get("media_group_id")
-
-            if hasattr(message, 'photo') and message.photo:
-                media_store = self.storage.temp.get(f"photo_{media_group_id}")
-                if media_store and hasattr(media_store, 'medias'):
-                    msg: Message = await self._sender_message_media_group_reply(
-                        chat_id=message_from_user_id, 
-                        medias=media_store.medias, 
-                        initial_message=initial_message
-                    )
-            
-            elif hasattr(message, 'video') and message.video:
-                media_store = self.storage.temp.get(f"video_{media_group_id}")
-                if media_store and hasattr(media_store, 'medias'):
-                    msg: Message = await self._sender_message_media_group_reply(
-                        chat_id=message_from_user_id, 
-                        medias=media_store.medias, 
-                        initial_message=initial_message
-                    )
-                
-            elif hasattr(message, 'document') and message.document:
-                media_store = self.storage.temp.get(f"document_{media_group_id}")
-                if media_store and hasattr(media_store, 'medias'):
-                    msg: Message = await self._sender_message_media_group_reply(
-                        chat_id=message_from_user_id, 
-                        medias=media_store.medias, 
-                        initial_message=initial_message
-                    )
+        if medias:
+            msg: Message = await self._sender_message_media_group_reply(
+                chat_id=message_from_user_id, 
+                medias=medias, 
+                initial_message=initial_message
+            )
 
         else:
             msg: Message = await self._sender_message_reply(message_from_user_id, message, initial_message)
@@ -479,9 +427,36 @@ class HandlerMessages:
             chat_id, message, initial_message
         )
 
-    async def _process_media_groups_after_delay(self, message_origin: Message, media_group_id: str) -> None:
+    async def _send_auto_closed_private(self, tickets: List[Ticket]) -> None:
         """
-        Process a media group after a short delay to collect all media.
+        Tell the users of auto-closed tickets that their ticket was closed.
+
+        Args:
+            tickets (List[Ticket]): The tickets closed by the auto-close.
+
+        Returns:
+            None
+        """
+        def send(ticket: Ticket):
+            initial_message = self.messages.replay_message(
+                self.template.messages.template_auto_closed_ticket,
+                ticket_id=ticket.ticket_id
+            )
+            return lambda: self.telebot.send_message(
+                chat_id=ticket.user_id,
+                text=initial_message.text,
+                parse_mode=initial_message.parse_mode
+            )
+
+        sent, failed = await self.sender.send_all(send(ticket) for ticket in tickets)
+        self.logger.info(f"Notified {sent} users of auto-closed tickets, {failed} failed")
+
+    async def _process_media_groups_after_delay(self, media_group_id: str) -> None:
+        """
+        Process a media group once all of its parts have arrived.
+
+        Only the worker that takes the album's parts forwards them, so the album is sent
+        and stored once even when its parts reached different workers.
         
         Args:
             media_group_id: The ID of the media group to process
@@ -492,29 +467,25 @@ class HandlerMessages:
         Raises:
             Exception: If there is an error during message processing or sending.
         """
-        await asyncio.sleep(0.01)
-
         try:
-            group_data: MessagesStore = self.storage.temp.get(media_group_id)
+            album: Optional[Album] = await self.albums.collect(media_group_id)
+            if not album:
+                return
 
-            if group_data and not group_data.processed:
-                messages = group_data.messages
+            messages = album.messages
+            message_origin = messages[0]
+            _message = messages[-1]
+            
+            for message in messages:
+                message_text = (message.text or message.caption)
+                if message_text:
+                    _message = message
+                    break
 
-                if not messages:
-                    self.logger.warning(f"No messages in media group {media_group_id}")
-                    return
-                
-                group_data.processed = True
-                self.storage.tempstore(media_group_id, group_data)
-                
-                _message = messages[-1]
-                
-                for message in messages:
-                    message_text = (message.text or message.caption)
-                    if message_text:
-                        _message = message
-                        break
+            ticket_open = await self.tickets.get_open_ticket_id(_message.from_user.id)
+            issue = await self.issue_generator.issue_generator(_message)
 
+            if not ticket_open:
                 ticket_id = generate_id(_message.from_user.id)
                 initial_message = self.messages.replay_message(
                     self.template.messages.reply_message_private, 
@@ -522,59 +493,29 @@ class HandlerMessages:
                     bot_name=self.config.bot.name
                 )
 
-                user_tickets = await self.tickets.get_user_tickets(_message.from_user.id)
-                ticket_open = next(iter(user_tickets), None)
-
-                if not ticket_open:
-                    await self.telebot.reply_to(
-                        message=message_origin,
-                        text=initial_message.text,  
-                        parse_mode=initial_message.parse_mode
-                    )
-
-                    msg: Union[Message,List[Message]] = await self._send_to_group(ticket_id=ticket_id, message=_message)
-                    
-                    issue = await self.issue_generator.issue_generator(_message)
-                    await self.tickets.create_ticket(
-                        ticket_id=ticket_id,
-                        user_id=_message.from_user.id,
-                        message_id=msg[-1].id,
-                        message_chat_id=msg[-1].chat.id,
-                        username=_message.from_user.username,
-                        userfullname=_message.from_user.full_name,
-                        issue=issue,
-                        timestamp=_message.date
-                    )
-
-                    if isinstance(msg, list):
-                        for m in msg:
-                            await self.tickets.add_message_to_ticket(
-                                ticket_id=ticket_id,
-                                user_id=_message.from_user.id,
-                                message_id=m.id,
-                                message_chat_id=m.chat.id,
-                                username=_message.from_user.username,
-                                userfullname=_message.from_user.full_name,
-                                message=await self.issue_generator.issue_generator(_message),
-                                message_from=self.message_from.user,
-                                timestamp=_message.date
-                            )
-                        return
+                await self.telebot.reply_to(
+                    message=message_origin,
+                    text=initial_message.text,  
+                    parse_mode=initial_message.parse_mode
+                )
 
-                    await self.tickets.add_message_to_ticket(
-                        ticket_id=ticket_id,
-                        user_id=_message.from_user.id,
-                        message_id=msg.id,
-                        message_chat_id=msg.chat.id,
-                        username=_message.from_user.username,
-                        userfullname=_message.from_user.full_name,
-                        message=await self.issue_generator.issue_generator(_message),
-                        message_from=self.message_from.user,
-                        timestamp=_message.date
-                    ); return
+                msg: Union[Message,List[Message]] = await self._send_to_group(
+                    ticket_id=ticket_id, message=_message, medias=album.medias
+                )
+                sent = msg if isinstance(msg, list) else [msg]
                 
-        
-                ticket_id = ticket_open.ticket_id
+                await self.tickets.create_ticket(
+                    ticket_id=ticket_id,
+                    user_id=_message.from_user.id,
+                    message_id=sent[-1].id,
+                    message_chat_id=sent[-1].chat.id,
+                    username=_message.from_user.username,
+                    userfullname=_message.from_user.full_name,
+                    issue=issue,
+                    timestamp=_message.date
+                )
+            else:
+                ticket_id = ticket_open
                 initial_message = self.messages.replay_message(
                     self.template.messages.reply_additional_message_private, 
                     ticket_id=ticket_id
@@ -585,44 +526,34 @@ class HandlerMessages:
                     text=initial_message.text,  
                     parse_mode=initial_message.parse_mode
                 )
-                msg: Union[Message,List[Message]] = await self._send_to_group(ticket_id=ticket_id, message=_message)
-                    
-                if isinstance(msg, list):
-                    for m in msg:
-                        await self.tickets.add_message_to_ticket(
-                            ticket_id=ticket_id,
-                            user_id=_message.from_user.id,
-                            message_id=m.id,
-                            message_chat_id=m.chat.id,
-                            username=_message.from_user.username,
-                            userfullname=_message.from_user.full_name,
-                            message=await self.issue_generator.issue_generator(_message),
-                            message_from=self.message_from.user,
-                            timestamp=_message.date
-                        ); return
+                msg: Union[Message,List[Message]] = await self._send_to_group(
+                    ticket_id=ticket_id, message=_message, medias=album.medias
+                )
+                sent = msg if isinstance(msg, list) else [msg]
 
-                await self.tickets.add_message_to_ticket(
-                    ticket_id=ticket_id,
-                    user_id=_message.from_user.id,
-                    message_id=msg.id,
-                    message_chat_id=msg.chat.id,
-                    username=_message.from_user.username,
-                    userfullname=_message.from_user.full_name,
-                    message=await self.issue_generator.issue_generator(_message),
-                    message_from=self.message_from.user,
-                    timestamp=_message.date
-                ); return
+            await self.tickets.add_messages_to_ticket(
+                ticket_id=ticket_id,
+                user_id=_message.from_user.id,
+                message_ids=[(m.id, m.chat.id) for m in sent],
+                username=_message.from_user.username,
+                userfullname=_message.from_user.full_name,
+                message=issue,
+                message_from=self.message_from.user,
+                timestamp=_message.date
+            )
             
         except Exception as e:
             self.logger.error(f"Error processing media group {media_group_id}: {e}")
 
-    async def _process_media_private_after_delay(self, ticket_id: str, media_group_id: str, username: str, initial_message: Messages) -> Message:
+    async def _process_media_private_after_delay(self, ticket_id: str, media_group_id: str, username: str, 
+                                                 initial_message: Messages, user_id: Optional[int] = None) -> Message:
         """
-        Process media group and send the message to a private chat after a delay.
+        Process media group and send the message to a private chat once all of its parts have arrived.
 
         Args:
             media_group_id (str): The unique identifier for the media group.
             username (str): The target username to send the message to.
+            user_id (int, optional): The target user ID when it is already known.
 
         Returns:
             Message: The sent message object.
@@ -630,35 +561,28 @@ class HandlerMessages:
         Raises:
             Exception: If there is an error during message processing or sending.
         """
-        await asyncio.sleep(0.1)
-
         try:
-            group_data: MessagesStore = self.storage.temp.get(media_group_id)
-
-            if group_data and not group_data.processed:
-                messages = group_data.messages
-
-                if not messages:
-                    self.logger.warning(f"No messages in media group {media_group_id}")
-                    return
-                
-                group_data.processed = True
-                self.storage.tempstore(media_group_id, group_data)
-                
-                _message = messages[-1]
-                
-                for message in messages:
-                    message_text = (message.text or message.caption)
-                    if message_text:
-                        _message = message
-                        break
+            album: Optional[Album] = await self.albums.collect(media_group_id)
+            if not album:
+                return
 
-                await self._send_to_private(message=_message, ticket_id=ticket_id, from_group=True, username=username)
-                await self.telebot.reply_to(
-                    message=message,
-                    text=initial_message.text,
-                    parse_mode=initial_message.parse_mode
-                )
+            _message = album.messages[-1]
+            
+            for message in album.messages:
+                message_text = (message.text or message.caption)
+                if message_text:
+                    _message = message
+                    break
+
+            await self._send_to_private(
+                message=_message, ticket_id=ticket_id, from_group=True, username=username, user_id=user_id,
+                medias=album.medias
+            )
+            await self.telebot.reply_to(
+                message=_message,
+                text=initial_message.text,
+                parse_mode=initial_message.parse_mode
+            )
         
         except Exception as e:
             self.logger.error(f"Error processing media group {media_group_id}: {e}")
@@ -683,44 +607,6 @@ class HandlerMessages:
             ); return
         return
     
-    async def _store_media_group(self, **kwargs):
-        message: Message = kwargs.get("message")
-        media_group_id: int = kwargs.get("media_group_id")
-        
-        self.storage.tempstore("media_group_id", media_group_id)
-
-        if media_group_id not in self.storage.temp.store:
-            self.storage.tempstore(
-                media_group_id, 
-                MessagesStore(**arson(messages=[], processed=False))
-            )
-            if hasattr(message, 'photo') and message.photo:
-                self.storage.tempstore(f"photo_{media_group_id}", MediaStores(medias=[]))
-            elif hasattr(message, 'video') and message.video:
-                self.storage.tempstore(f"video_{media_group_id}", MediaStores(medias=[]))
-            elif hasattr(message, 'document') and message.document:
-                self.storage.tempstore(f"document_{media_group_id}", MediaStores(medias=[]))
-
-        group_data: MessagesStore = self.storage.temp.get(media_group_id)
-        group_data.messages.append(message)
-        self.storage.tempstore(media_group_id, group_data)
-        
-        if hasattr(message, 'photo') and message.photo:
-            group_media: MediaStores = self.storage.temp.get(f"photo_{media_group_id}")
-            group_media.medias.append(InputMediaPhoto(media=message.photo[-1].file_id))
-            self.storage.tempstore(f"photo_{media_group_id}", group_media)
-        
-        elif hasattr(message, 'video') and message.video:
-            group_media: MediaStores = self.storage.temp.get(f"video_{media_group_id}")
-            group_media.medias.append(InputMediaVideo(media=message.video.file_id))
-            self.storage.tempstore(f"video_{media_group_id}", group_media)
-
-        elif hasattr(message, 'document') and message.document:
-            group_media: MediaStores = self.storage.temp.get(f"document_{media_group_id}")
-            group_media.medias.append(InputMediaDocument(media=message.document.file_id))
-            self.storage.tempstore(f"document_{media_group_id}", group_media)
-
-    
     async def _handle_media_group_message_private(self, message: Message, media_group_id: str) -> None:
         """
         Handle messages that are part of a media group.
@@ -731,15 +617,13 @@ class HandlerMessages:
             ticket_id: The ticket ID associated with the message
             initial_message: The initial response message
         """
-        await self._store_media_group(
-            message=message,
-            media_group_id=media_group_id
-        )
-        asyncio.create_task(self._process_media_groups_after_delay(message, media_group_id))
+        if await self.albums.add(media_group_id, message):
+            asyncio.create_task(self._process_media_groups_after_delay(media_group_id))
 
 
     async def _handle_media_group_message_group(self, message: Message, media_group_id: str, 
-                                         ticket_id: int, username: str, initial_message: Messages) -> None:
+                                         ticket_id: int, username: str, initial_message: Messages,
+                                         user_id: Optional[int] = None) -> None:
         """
         Handle messages that are part of a media group.
         
@@ -749,16 +633,44 @@ class HandlerMessages:
             ticket_id: The ticket ID associated with the message
             username: The target username to send the message to.
             initial_message: The initial response message
+            user_id: The target user ID when it is already known
         
         Returns:
             None
         """
-        await self._store_media_group(
-            message=message,
-            media_group_id=media_group_id
-        )
-        asyncio.create_task(self._process_media_private_after_delay(ticket_id, media_group_id, username, initial_message))
+        if await self.albums.add(media_group_id, message):
+            asyncio.create_task(
+                self._process_media_private_after_delay(ticket_id, media_group_id, username, initial_message, user_id)
+            )
+
+
+    async def _within_rate_limit(self, message: Message, limiter: RateLimiter, key: int) -> bool:
+        """
+        Check the sender's token bucket before doing any work for a message.
+
+        Args:
+            message: The incoming message
+            limiter: Limiter to check, per user or per chat
+            key: User or chat ID the bucket belongs to
 
+        Returns:
+            False when the message should be dropped; the sender is told once per throttling.
+        """
+        if await limiter.allow(key):
+            return True
+
+        self.logger.debug(f"Throttled message {message.message_id} from {limiter.prefix}:{key}")
+        if await limiter.should_notify(key):
+            initial_message = self.messages.privcommon(self.template.messages.template_rate_limited)
+            try:
+                await self.telebot.reply_to(
+                    message=message,
+                    text=initial_message.text,
+                    parse_mode=initial_message.parse_mode
+                )
+            except Exception as e:
+                self.logger.warning(f"Failed to send throttle notice to {key}: {e}")
+        return False
 
     async def _send_error_response(self, message: Message | CallbackQuery, template, **kwargs):
         """
@@ -900,8 +812,7 @@ class HandlerMessages:
                 await self._handle_media_group_message_private(message, media_group_id)
             else:
 
-                user_tickets = await self.tickets.get_user_tickets(message.from_user.id)
-                ticket_open = next(iter(user_tickets), None)
+                ticket_open = await self.tickets.get_open_ticket_id(message.from_user.id)
 
                 if not ticket_open:
                     ticket_id = generate_id(message.from_user.id)
@@ -942,7 +853,7 @@ class HandlerMessages:
                     ); return
 
         
-                ticket_id = ticket_open.ticket_id
+                ticket_id = ticket_open
                 initial_message = self.messages.replay_message(
                     self.template.messages.reply_additional_message_private, 
                     ticket_id=ticket_id
@@ -1006,7 +917,8 @@ class HandlerMessages:
             ticket_id = matches.group(1)
             username = matches.group(3)
 
-            closed_ticket = await self.tickets.get_closed_ticket_by_ticketid(ticket_id)
+            context = await self.tickets.get_ticket_context(ticket_id=ticket_id, username=username)
+            closed_ticket = context.closed_ticket
             if closed_ticket:
                 initial_message = self.messages.reply_message_group(
                     self.template.messages.template_reply_closed_ticket,
@@ -1031,10 +943,11 @@ class HandlerMessages:
                     media_group_id=media_group_id, 
                     ticket_id=ticket_id,
                     username=username, 
-                    initial_message=initial_message
+                    initial_message=initial_message,
+                    user_id=context.owner_id
                 ); return
 
-            msg: Message = await self._send_to_private(message, ticket_id, True, username)
+            msg: Message = await self._send_to_private(message, ticket_id, True, username, context.owner_id)
             await self.telebot.reply_to(
                 message=message,
                 text=initial_message.text,
@@ -1156,11 +1069,26 @@ class HandlerMessages:
                 message=message,
                 template=self.template.messages.template_invalid_format_message
             )
-    
+
         ticket_id = matches.group(1)
-        username = matches.group(3)
+        context = await self.tickets.get_ticket_context(ticket_id=ticket_id, username=matches.group(3))
+
+        closed_ticket = context.closed_ticket
+        timestamp = epodate(message.date)
+        handler_username = self.markdown.escape_markdown(message.from_user.username)
+        if not closed_ticket:
+            closed = await self.tickets.close_ticket(
+                ticket_id=ticket_id,
+                handler_id=message.from_user.id,
+                handler_username=handler_username,
+                timezone=self.config.timezone
+            )
+            if not closed:
+                # Closed by someone else since the context was read
+                closed_ticket = await self.tickets.get_closed_ticket_by_ticketid(ticket_id)
+                if not closed_ticket:
+                    return
 
-        closed_ticket = await self.tickets.get_closed_ticket_by_ticketid(ticket_id)
         if closed_ticket:
             initial_message = self.messages.reply_message_group(
                 self.template.messages.template_reply_closed_ticket,
@@ -1173,17 +1101,6 @@ class HandlerMessages:
                 parse_mode=initial_message.parse_mode
             ); return
 
-        user_id = await self.tickets.get_userid_by_username(username)
-
-        timestamp = epodate(message.date)
-        handler_username = self.markdown.escape_markdown(message.from_user.username)
-        await self.tickets.close_ticket(
-            ticket_id=ticket_id,
-            handler_id=message.from_user.id,
-            handler_username=handler_username,
-            timezone=self.config.timezone
-        )
-
         initial_message = self.messages.replay_message(
             text=self.template.messages.template_closed_ticket,
             ticket_id=ticket_id,
@@ -1196,7 +1113,7 @@ class HandlerMessages:
             parse_mode=initial_message.parse_mode
         )
         await self._send_closed_private(
-            user_id.get("id"), 
+            context.owner_id, 
             message, 
             ticket_id=ticket_id, 
             username=self.markdown.escape_markdown(message.from_user.username),
@@ -1241,7 +1158,6 @@ class HandlerMessages:
         
         messages = message.reply_to_message.text or message.reply_to_message.caption
         matches = search(messages, MESSAGE_PATTERN)
-
         if not matches:
             return await self._send_error_response(
                 message=message,
@@ -1249,26 +1165,30 @@ class HandlerMessages:
             )
 
         ticket_id = matches.group(1)
-        conversation = await self.tickets.get_ticket_messages(
-            ticket_id=ticket_id,
-            user_id=message.from_user.id,
-            is_handler=True,
-        )
+        context = await self.tickets.get_ticket_context(ticket_id=ticket_id, with_messages=True)
+        transcript = context.transcript
 
-        if not conversation:
+        if not transcript or not (transcript.count or transcript.pending):
             return await self._send_error_response(
                 message=message,
                 template=self.template.messages.template_not_conversation,
                 ticket_id=ticket_id
             )
         
-        initial_message = self.messages.conversation_message(
-            template=self.template.messages.template_conversation,
+        transcript = self.messages.render_transcript(
             content_template=self.template.messages.template_content_conversation,
-            contents=conversation,
-            ticket_id=ticket_id,
+            transcript=transcript,
             func=self.markdown.escape_markdown
         )
+        # Closed tickets are read once at most, only open conversations are worth keeping
+        if not context.closed_ticket:
+            await self.tickets.cache_transcript(ticket_id, transcript)
+
+        initial_message = self.messages.conversation_message(
+            template=self.template.messages.template_conversation,
+            transcript=transcript,
+            ticket_id=ticket_id
+        )
         await self.telebot.reply_to(
             message=message,
             text=initial_message.text,
@@ -1319,26 +1239,36 @@ class HandlerMessages:
 
     async def handler_history_time_range(self, call: CallbackQuery):
         time_range = call.data
-        history_tickets = await self.tickets.get_user_tickets_history(
-            user_id=call.from_user.id,
-            time_range=time_range
-        )
-        if not history_tickets:
+        # One set of bounds for the lookup, the query and the cache entry, even across a rollover
+        period = time_period(time_range)
+        rendered = await self.tickets.get_cached_history(call.from_user.id, time_range, period)
+        if rendered is None:
+            history_tickets = await self.tickets.get_user_tickets_history(
+                user_id=call.from_user.id,
+                time_range=time_range,
+                period=period
+            )
+            rendered = {}
+            if history_tickets:
+                initial_message = self.messages.history_message(
+                    template=self.template.messages.template_history,
+                    content_template=self.template.messages.template_list_history,
+                    contents=history_tickets,
+                    time_range=time_range
+                )
+                rendered = {"text": initial_message.text, "parse_mode": initial_message.parse_mode}
+            await self.tickets.cache_history(call.from_user.id, time_range, rendered, period)
+
+        if not rendered:
             return await self._send_error_response(
                 message=call,
                 template=self.template.messages.template_empty_history
             )
-        
-        initial_message = self.messages.history_message(
-            template=self.template.messages.template_history,
-            content_template=self.template.messages.template_list_history,
-            contents=history_tickets,
-            time_range=time_range
-        )
+
         await self.telebot.send_message(
             chat_id=call.message.chat.id, 
-            text=initial_message.text, 
-            parse_mode=initial_message.parse_mode
+            text=rendered["text"], 
+            parse_mode=rendered["parse_mode"]
         ); return
     
 
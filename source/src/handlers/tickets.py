@@ -1,10 +1,13 @@
 import re
+import math
+import time
 import traceback
 import asyncio
 
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Awaitable, Callable, Optional, Tuple, Union
 from loguru import logger
 from datetime import datetime
+from dataclasses import replace
 
 from src.localization.queries import (
     CREATE_TABLE_ROLES,
@@ -14,11 +17,21 @@ from src.localization.queries import (
     CREATE_TABLE_TICKETS,
     CREATE_TABLE_TICKET_MESSAGES,
     CREATE_TABLE_BANNED_USERS,
+    CREATE_TABLE_TICKETS_SHARD,
+    CREATE_TABLE_TICKET_MESSAGES_SHARD,
     GET_ALL_TABLES,
     GET_HISTORY_USER_TICKETS,
     GET_HISTORY_HANDLER_TICKETS,
     GET_TICKET_MESSAGES,
-    GET_ALL_TICKET_MESSAGES
+    GET_TICKET_MESSAGES_SINCE,
+    GET_CLOSED_TICKETS_BY_TICKETID,
+    GET_USER_BY_USERNAME,
+    GET_STAFF_USERS,
+    GET_USERS_BY_IDS,
+    LOCK_OPEN_TICKETS,
+    CLOSE_TICKETS,
+    GET_OPEN_TICKET_OWNERS,
+    GET_RECENT_TICKET_USERS
 )
 from src.types.models import (
     User,
@@ -27,9 +40,33 @@ from src.types.models import (
     TicketMessage,
     BannedUser
 )
-from src.utility.utility import generate_id, curtime, epodate
+from src.types.tickets import TicketContext
+from src.types.data_store import RoleEntry, Transcript, CacheNamespace
+from src.utility.utility import generate_id, epodate, time_period, STORE_TIMEZONE
+from src.utility.const import TIME_RANGES
 from src.library.database import BtAioMysql
+from src.library.sharding import ShardRouter
 from src.library.redis import BtRedis
+from src.library.cache import TTLCache, TwoTierCache, MISSING
+from src.controller.roster import HandlerRoster
+
+# Sorted set of open ticket sessions scored by their expiry time (Unix seconds)
+SESSION_EXPIRY_KEY = "ticket_sessions"
+
+# Claim tickets for closing by removing them from the session expiry index, returning
+# {session PTTL, claimed} per ticket. With a fence (ARGV[1] set), nothing is claimed and
+# nil is returned unless the lease at KEYS[2] still holds the value ARGV[2].
+CLAIM_EXPIRED_SCRIPT = """
+if ARGV[1] ~= '' and redis.call('GET', KEYS[2]) ~= ARGV[2] then
+    return false
+end
+local replies = {}
+for i = 3, #KEYS do
+    replies[#replies + 1] = redis.call('PTTL', KEYS[i])
+    replies[#replies + 1] = redis.call('ZREM', KEYS[1], ARGV[i])
+end
+return replies
+"""
 
 
 class HandlerTickets(BtAioMysql):
@@ -44,71 +81,283 @@ class HandlerTickets(BtAioMysql):
         """
         super().__init__(pool_size=pool_size, connect_timeout=connect_timeout)
         self.logger = logger
+        if self.config.database.shards:
+            self.shards = ShardRouter([
+                BtAioMysql(pool_size=pool_size, connect_timeout=connect_timeout, database=shard)
+                for shard in self.config.database.shards
+            ])
+            self.logger.info(f"Ticket data sharded across {len(self.config.database.shards)} databases")
         self.redis: Optional[BtRedis] = None
         self.session_ttl: int = 86400 # Default 24h
+        # Sessions refreshed recently enough are not written again (see _update_ticket_session).
+        # Deliberately per replica: it only records this replica's own writes, and a refresh
+        # by another replica can only lengthen the session.
+        self.session_refresh_fraction: float = 0.95
+        self._session_refreshed: TTLCache = TTLCache(maxsize=10000, ttl=None)
+        self.session_counters: Dict[str, int] = {"refreshes": 0, "skipped": 0}
+        self._claim_expired = None
+        self.cache: TwoTierCache = TwoTierCache(channel=self.config.redis.cache_channel)
+        ttls = self.config.redis.cache_ttls
+        self.cache.register(CacheNamespace(name="roles", ttl=ttls.get("roles", 600), maxsize=4096))
+        self.cache.register(CacheNamespace(
+            name="open_tickets", ttl=ttls.get("open_tickets", 3600), negative_ttl=30, maxsize=10000
+        ))
+        self.cache.register(CacheNamespace(
+            name="user_ids", ttl=ttls.get("user_ids", 3600), negative_ttl=60, maxsize=10000
+        ))
+        # Closed tickets are cached until evicted, other tickets only briefly. Kept out of L2,
+        # where closed rows would never expire; replicas cannot diverge since a closed ticket
+        # never reopens and every close broadcasts the invalidation of the "open" entries.
+        self.cache.register(CacheNamespace(
+            name="ticket_status", ttl=ttls.get("ticket_status", 60), maxsize=10000, shared=False
+        ))
+        # Rendered /history replies, kept until the period rolls over or the user's tickets change
+        self.cache.register(CacheNamespace(
+            name="history", ttl=ttls.get("history", 604800), maxsize=4096
+        ))
+        # Handler roster, local since it is only a few rows; role changes invalidate it on every
+        # replica and the TTL bounds how long a missed invalidation can last
+        self.cache.register(CacheNamespace(
+            name="roster", ttl=ttls.get("roster", 300), maxsize=1, shared=False
+        ))
+        # Rendered conversations of open tickets; readers always fetch the messages added
+        # since, so a copy that misses a write is caught up rather than served stale
+        self.cache.register(CacheNamespace(
+            name="transcripts", ttl=ttls.get("transcripts", 3600), maxsize=1000
+        ))
+        # Called with the tickets closed by the auto-close, e.g. to notify their users
+        self.on_auto_closed: Optional[Callable[[List[Ticket]], Awaitable[None]]] = None
+
+    def _ticket_db(self, user_id: int) -> BtAioMysql:
+        """Database holding the ticket data of ``user_id``."""
+        return self.shards.shard_for(user_id) if self.shards else self
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss/eviction counters of the in-process caches."""
+        return {
+            **self.cache.stats(),
+            "sessions": {"size": len(self._session_refreshed), **self.session_counters}
+        }
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Concurrency limit and pool usage of the primary database and of each shard."""
+        stats = {"primary": self.metrics()}
+        for index, shard in enumerate(self.shards.shards if self.shards else []):
+            stats[f"shard_{index}"] = shard.metrics()
+        return stats
+
+    async def _cache_role(self, role_id: int, username: Optional[str], user_id: Optional[int] = None) -> None:
+        entry = RoleEntry(role_id=role_id, user_id=user_id, username=username)
+        if username:
+            await self.cache.set("roles", ("username", username), entry, publish=False)
+        if user_id is not None:
+            await self.cache.set("roles", ("id", user_id), entry, publish=False)
 
-    def set_redis(self, redis_client: BtRedis, session_ttl: int):
+    async def _invalidate_roles(self, user_id: Optional[int] = None, *usernames: Optional[str]) -> None:
+        """Drop cached roles of a user, keyed by ID, the username cached with it or any of the given usernames."""
+        keys = [("username", username) for username in usernames if username]
+        if user_id is not None:
+            entry = await self.cache.get("roles", ("id", user_id))
+            if entry and entry.username:
+                keys.append(("username", entry.username))
+            keys.append(("id", user_id))
+        await self.cache.invalidate("roles", *keys)
+
+    async def _cache_ticket_status(self, ticket_id: str, closed_ticket: Optional[Ticket], publish: bool = False) -> None:
+        if closed_ticket:
+            await self.cache.set("ticket_status", ticket_id, closed_ticket, ttl=math.inf, publish=publish)
+        else:
+            await self.cache.set("ticket_status", ticket_id, "open", publish=publish)
+
+    def set_redis(self, redis_client: BtRedis, session_ttl: int, session_refresh_fraction: float = 0.95):
         self.redis = redis_client
         self.session_ttl = session_ttl
+        self.session_refresh_fraction = session_refresh_fraction
+        self.cache.redis = redis_client
+        for model in (User, Ticket, TicketMessage, RoleEntry, Transcript):
+            redis_client.codec.register(model)
 
-    async def _update_ticket_session(self, ticket_id: str):
+    async def _update_ticket_session(self, ticket_id: str, force: bool = False):
         """
         Update or extend ticket session in Redis.
         Session is extended by resetting TTL to session_ttl.
+
+        The refresh is skipped while the session this replica last wrote still has more
+        than ``session_refresh_fraction`` of its TTL left, so a busy ticket costs one
+        write per ``(1 - fraction) * session_ttl`` instead of one per message. Another
+        replica refreshing meanwhile only lengthens the session, so skipping stays safe.
         """
         if not self.redis:
             return
+
+        if not force and ticket_id in self._session_refreshed:
+            self.session_counters["skipped"] += 1
+            return
         
         try:
             key = f"ticket_session:{ticket_id}"
             # Logic: 24 - (sisa waktu sesi) basically means resetting to 24 hours
             # because if we add (24 - sisa), it becomes sisa + 24 - sisa = 24.
-            await self.redis.client.set(key, "active", ex=self.session_ttl)
+            async with self.redis.client.pipeline(transaction=False) as pipe:
+                pipe.set(key, "active", ex=self.session_ttl)
+                pipe.zadd(SESSION_EXPIRY_KEY, {ticket_id: time.time() + self.session_ttl})
+                await pipe.execute()
+            self._session_refreshed.set(ticket_id, True, ttl=self.session_ttl * (1 - self.session_refresh_fraction))
+            self.session_counters["refreshes"] += 1
             self.logger.debug(f"Extended session for ticket {ticket_id}")
         except Exception as e:
             self.logger.error(f"Failed to update ticket session in Redis: {e}")
 
-    async def check_and_close_expired_tickets(self, timezone: str):
+    async def index_ticket_sessions(self) -> int:
         """
-        Check database for open tickets and close those that don't have an active session in Redis.
+        Add open tickets missing from the session expiry index, e.g. after an upgrade, a Redis
+        flush or eviction, or a failed session write. Run on every reconcile interval.
+
+        Tickets whose session key is still alive are scored by its remaining TTL, the
+        others are due immediately.
+
+        Returns:
+            Number of tickets added to the index.
         """
         if not self.redis:
-            return
+            return 0
 
         try:
             open_tickets = await self.get_opened_tickets()
-            for ticket in open_tickets:
-                key = f"ticket_session:{ticket.ticket_id}"
-                is_active = await self.redis.client.exists(key)
-                
-                if not is_active:
-                    self.logger.info(f"Ticket {ticket.ticket_id} session expired. Auto-closing...")
-                    # Use a system handler ID or 0 for auto-close
-                    await self.close_ticket(
-                        ticket_id=ticket.ticket_id,
-                        handler_id=0,
-                        handler_username="SYSTEM_AUTO_CLOSE",
-                        timezone=timezone
-                    )
+            if not open_tickets:
+                return 0
+
+            async with self.redis.client.pipeline(transaction=False) as pipe:
+                for ticket in open_tickets:
+                    pipe.zscore(SESSION_EXPIRY_KEY, ticket.ticket_id)
+                    pipe.pttl(f"ticket_session:{ticket.ticket_id}")
+                replies = await pipe.execute()
+
+            now = time.time()
+            missing = {}
+            for ticket, score, pttl in zip(open_tickets, replies[::2], replies[1::2]):
+                if score is None:
+                    missing[ticket.ticket_id] = now + pttl / 1000 if pttl > 0 else now
+
+            if missing:
+                await self.redis.client.zadd(SESSION_EXPIRY_KEY, missing, nx=True)
+                self.logger.info(f"Indexed {len(missing)} open ticket sessions for auto-close")
+            return len(missing)
+        except Exception as e:
+            self.logger.error(f"Failed to index ticket sessions: {e}")
+            raise
+
+    async def close_expired_sessions(
+            self,
+            ticket_ids: List[str],
+            chunk_size: int = 100,
+            fence: Optional[Tuple[str, str]] = None) -> List[Ticket]:
+        """
+        Close the given tickets if their session has really expired.
+
+        Each ticket is claimed by removing it from the session expiry index, so that
+        several bot replicas (or the sweep and an expiry notification) never close the
+        same ticket twice. Claimed tickets are closed ``chunk_size`` at a time.
+
+        Args:
+            ticket_ids: Tickets to check.
+            chunk_size: Tickets closed per UPDATE.
+            fence: ``(lease key, lease value)`` of the leader term running the close, see
+                ``LeaderElection.fence``. The claim is checked against the lease atomically,
+                so a former leader resuming after a pause claims nothing; tickets it claimed
+                while still leader are no longer in the index for its successor.
+
+        Returns:
+            The tickets that were closed.
+        """
+        now = time.time()
+        if self._claim_expired is None:
+            self._claim_expired = self.redis.client.register_script(CLAIM_EXPIRED_SCRIPT)
+        lease_key, lease_value = fence or (SESSION_EXPIRY_KEY, "")
+        replies = await self._claim_expired(
+            keys=[SESSION_EXPIRY_KEY, lease_key, *(f"ticket_session:{ticket_id}" for ticket_id in ticket_ids)],
+            args=["1" if fence else "", lease_value, *ticket_ids]
+        )
+        if replies is None:
+            self.logger.warning(f"Not closing {len(ticket_ids)} expired tickets, lease {lease_key} is no longer held")
+            return []
+
+        expired, refreshed = [], {}
+        for ticket_id, pttl, claimed in zip(ticket_ids, replies[::2], replies[1::2]):
+            if not claimed:
+                continue
+            if pttl > 0:
+                # Refreshed after the score was read; put it back at its real expiry
+                refreshed[ticket_id] = now + pttl / 1000
+            else:
+                expired.append(ticket_id)
+        if refreshed:
+            await self.redis.client.zadd(SESSION_EXPIRY_KEY, refreshed)
+
+        closed = []
+        for start in range(0, len(expired), chunk_size):
+            chunk = expired[start:start + chunk_size]
+            self.logger.info(f"{len(chunk)} ticket sessions expired. Auto-closing...")
+            try:
+                # Use a system handler ID or 0 for auto-close
+                closed.extend(await self.close_tickets(chunk, handler_id=0, handler_username="SYSTEM_AUTO_CLOSE"))
+            except Exception:
+                # Retry on a later run rather than leaving the tickets open forever
+                retry_at = time.time() + 60
+                await self.redis.client.zadd(SESSION_EXPIRY_KEY, {ticket_id: retry_at for ticket_id in chunk})
+        return closed
+
+    async def check_and_close_expired_tickets(
+            self,
+            timezone: str,
+            batch_size: int = 100,
+            fence: Optional[Tuple[str, str]] = None) -> Optional[float]:
+        """
+        Close the tickets whose session has expired, as recorded in the session expiry index.
+
+        Only the due members of the sorted set are read, ``batch_size`` at a time.
+        ``fence`` is passed on to ``close_expired_sessions``.
+
+        Returns:
+            Seconds until the next session expires, or None when no session is pending.
+        """
+        if not self.redis:
+            return None
+
+        try:
+            closed = []
+            while True:
+                due = await self.redis.client.zrangebyscore(
+                    SESSION_EXPIRY_KEY, "-inf", time.time(), start=0, num=batch_size
+                )
+                if not due:
+                    break
+                closed.extend(await self.close_expired_sessions(due, fence=fence))
+                if len(due) < batch_size:
+                    break
+            await self._notify_auto_closed(closed)
+
+            upcoming = await self.redis.client.zrange(SESSION_EXPIRY_KEY, 0, 0, withscores=True)
+            return max(upcoming[0][1] - time.time(), 0.0) if upcoming else None
         except Exception as e:
             self.logger.error(f"Error during auto-closing expired tickets: {e}")
+            return None
     
-    async def _query_time_range(self, column: str, time_range: str):
-        if not isinstance(column, str) and not isinstance(time_range, str):
-            raise TypeError("Both 'column' and 'time_range' must be strings.")
-        
-        if time_range == 'today':
-            date_filter = f"AND DATE({column}) = CURDATE()"
-        elif time_range == 'weekly':
-            date_filter = f"AND YEARWEEK({column}, 1) = YEARWEEK(CURDATE(), 1)"
-        elif time_range == 'monthly':
-            date_filter = f"AND YEAR({column}) = YEAR(CURDATE()) AND MONTH({column}) = MONTH(CURDATE())"
-        elif time_range == 'yearly':
-            date_filter = f"AND YEAR({column}) = YEAR(CURDATE())"
-        else:
-            raise ValueError("Invalid time range. Use 'today', 'weekly', 'monthly', or 'yearly'.")
-        return date_filter
-    
+    async def on_session_expired(self, key: str, fence: Optional[Tuple[str, str]] = None) -> None:
+        """Close a ticket as soon as Redis reports its ``ticket_session:<id>`` key expired."""
+        try:
+            await self._notify_auto_closed(await self.close_expired_sessions([key.split(":", 1)[1]], fence=fence))
+        except Exception as e:
+            self.logger.error(f"Error auto-closing ticket for expired key {key}: {e}")
+
+    async def _notify_auto_closed(self, tickets: List[Ticket]) -> None:
+        if not tickets or not self.on_auto_closed:
+            return
+        try:
+            await self.on_auto_closed(tickets)
+        except Exception as e:
+            self.logger.error(f"Failed to notify users of {len(tickets)} auto-closed tickets: {e}")
+
     async def setup_tables(self, database: str) -> None:
         """
         Create required tables for the handler system if they do not exist.
@@ -118,12 +367,12 @@ class HandlerTickets(BtAioMysql):
             existing_table_names = [table.get("TABLE_NAME") for table in existing_tables]
             self.logger.info(existing_table_names)
 
+            ticket_tables = [] if self.shards else [CREATE_TABLE_TICKETS, CREATE_TABLE_TICKET_MESSAGES]
             tables_to_create = [
                 table_def for table_def in [
                     CREATE_TABLE_ROLES,
                     CREATE_TABLE_USERS,
-                    CREATE_TABLE_TICKETS, 
-                    CREATE_TABLE_TICKET_MESSAGES, 
+                    *ticket_tables,
                     CREATE_TABLE_BANNED_USERS
                 ]
                 if self._extract_table_name(table_def) not in existing_table_names
@@ -135,6 +384,10 @@ class HandlerTickets(BtAioMysql):
             else:
                 self.logger.info("All required tables already exist")
 
+            if self.shards:
+                await self.shards.create_tables([CREATE_TABLE_TICKETS_SHARD, CREATE_TABLE_TICKET_MESSAGES_SHARD])
+                self.logger.info(f"Ensured ticket tables on {len(self.shards.shards)} shards")
+
             # Always ensure roles and system user are initialized
             await self.execute(INITIALIZE_ROLES)
             await self.execute(INITIALIZE_SYSTEM_USER)
@@ -160,6 +413,8 @@ class HandlerTickets(BtAioMysql):
                 """
                 await self.execute(query, (admin_id,))
                 self.logger.info(f"Initialized admin ID {admin_id} from config")
+            await self.cache.clear("roles")
+            await self._invalidate_roster()
         except Exception as e:
             self.logger.error(f"Failed to initialize admins: {e}")
             raise
@@ -193,6 +448,9 @@ class HandlerTickets(BtAioMysql):
                 last_name = VALUES(last_name)
             """
             await self.execute(query, (id, role_id, first_name, username, last_name, is_bot))
+            await self._invalidate_roles(id, username)
+            await self.cache.invalidate("user_ids", username)
+            await self._invalidate_roster()
             self.logger.info(f"Registered/Updated user {id} (@{username}) with role_id {role_id}")
             return True
         except Exception as e:
@@ -265,7 +523,15 @@ class HandlerTickets(BtAioMysql):
                 if has_changes:
                     self.logger.info(f"User {id} details changed, updating...")
                     await self.update_user(id, first_name, username, last_name)
-                
+                    await self._invalidate_roles(id, user.username, username)
+                    if user.role_id == 2:
+                        await self._invalidate_roster()
+                    if user.username != username:
+                        await self.cache.invalidate("user_ids", user.username)
+                    if username:
+                        await self.cache.set("user_ids", username, id)
+                elif username:
+                    self.cache.set_local("user_ids", username, id)
                 return user.role_id
 
             # 2. If ID not found, try to find by username (if available)
@@ -276,6 +542,10 @@ class HandlerTickets(BtAioMysql):
                 if user_by_username:
                     self.logger.info(f"User found by username @{username}, updating ID from {user_by_username.id} to {id}")
                     await self.update_user_by_username(id, username, first_name, last_name)
+                    await self._invalidate_roles(user_by_username.id, username)
+                    if user_by_username.role_id == 2:
+                        await self._invalidate_roster()
+                    await self.cache.set("user_ids", username, id)
                     return user_by_username.role_id
 
             # 3. User not found, register as new user
@@ -287,16 +557,104 @@ class HandlerTickets(BtAioMysql):
                 username=username,
                 last_name=last_name
             )
+            if username:
+                await self.cache.set("user_ids", username, id)
             return 1 # Default role for new users
             
         except Exception as e:
             self.logger.error(f"Failed to ensure user {id}: {str(e)}")
             raise
     
+    async def get_ticket_context(
+            self,
+            ticket_id: Optional[str] = None,
+            username: Optional[str] = None,
+            with_messages: bool = False) -> TicketContext:
+        """
+        Load the independent lookups a ticket command needs in a single round trip.
+
+        Call it only once the issuing user is authorized; it may load a whole conversation.
+
+        Args:
+            ticket_id: Ticket to check for a closed status (and load messages for).
+            username: Username of the ticket owner, resolved to their user ID.
+            with_messages: Also load the ticket conversation. A cached transcript is topped up
+                with the messages added after it, in the same round trip.
+        """
+        try:
+            statements = {}
+            owner_id = await self.cache.get("user_ids", username, default=MISSING) if username else None
+            if owner_id is MISSING:
+                owner_id = None
+                statements["owner"] = (GET_USER_BY_USERNAME, (username,))
+
+            ticket_statements = {}
+            cached_status = await self.cache.get("ticket_status", ticket_id) if ticket_id else None
+            if ticket_id and cached_status is None:
+                ticket_statements["closed_ticket"] = (GET_CLOSED_TICKETS_BY_TICKETID, (ticket_id,))
+            transcript = await self.cache.get("transcripts", ticket_id) if ticket_id and with_messages else None
+            if ticket_id and with_messages:
+                last_id = transcript.last_id if transcript else 0
+                ticket_statements["messages"] = (GET_TICKET_MESSAGES_SINCE, (ticket_id, last_id))
+
+            # Users live on the primary; with sharding, the ticket lookups go to the ticket's shard
+            ticket_db = await self.shards.locate_ticket(ticket_id) if self.shards and ticket_statements else self
+            if ticket_db is self:
+                statements.update(ticket_statements)
+                ticket_statements = {}
+            elif not ticket_db:
+                ticket_statements = {}
+
+            if ticket_statements:
+                rows, ticket_rows = await asyncio.gather(
+                    self.fetch_batch(list(statements.values())),
+                    ticket_db.fetch_batch(list(ticket_statements.values()))
+                )
+            else:
+                rows, ticket_rows = await self.fetch_batch(list(statements.values())), []
+            results = {
+                **dict(zip(statements, rows)),
+                **dict(zip(ticket_statements, ticket_rows))
+            }
+            owners = results.get("owner") or []
+            if "owner" in results:
+                owner_id = owners[0].get("id") if owners else None
+                await self.cache.set("user_ids", username, owner_id, publish=False)
+
+            if "closed_ticket" in results:
+                closed_tickets = results["closed_ticket"]
+                closed_ticket = Ticket(**closed_tickets[0]) if closed_tickets else None
+                await self._cache_ticket_status(ticket_id, closed_ticket)
+            else:
+                closed_ticket = cached_status if isinstance(cached_status, Ticket) else None
+
+            if "messages" in results:
+                pending = [TicketMessage(**row) for row in results["messages"]]
+                transcript = replace(transcript, pending=pending) if transcript else Transcript(pending=pending)
+
+            return TicketContext(
+                closed_ticket=closed_ticket,
+                owner_id=owner_id,
+                transcript=transcript
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to load context for ticket {ticket_id}: {str(e)}")
+            raise
+
+    async def cache_transcript(self, ticket_id: str, transcript: Transcript) -> None:
+        """Keep a rendered transcript of an open ticket for the next ``/conversation``."""
+        if not transcript.count:
+            return
+        await self.cache.set("transcripts", ticket_id, replace(transcript, pending=[]), publish=False)
+
     async def get_userid_by_username(self, username: str):
         try:
-            user = await User.objects.filter(username=username).get()
-            return {"id": user.id} if user else None
+            async def load():
+                user = await User.objects.filter(username=username).get()
+                return user.id if user else None
+
+            user_id = await self.cache.get("user_ids", username, loader=load)
+            return {"id": user_id} if user_id is not None else None
         except Exception as e:
             self.logger.error(f"Failed to get userid with {username}: {str(e)}")
             raise
@@ -319,26 +677,113 @@ class HandlerTickets(BtAioMysql):
         try:
             # Update user role back to user (role_id = 1)
             affected_rows = await User.objects.filter(id=user_id).update(role_id=1)
+            await self._invalidate_roles(user_id)
+            await self._invalidate_roster()
             self.logger.info(f"Deregistered handler: (ID: {user_id})")
             return affected_rows > 0
         except Exception as e:
             self.logger.error(f"Failed to deregister handler (ID: {user_id}): {str(e)}")
             raise
 
-    async def get_user_role(self, username: str) -> int:
+    async def get_user_role(self, username: str, user_id: Optional[int] = None) -> int:
         """
         Retrieve the role_id for a specific user by username.
+        Served from the role cache, keyed by Telegram user ID and username, when possible.
         """
         try:
+            entry = await self.cache.get("roles", ("id", user_id)) if user_id is not None else None
+            if entry is None and username:
+                entry = await self.cache.get("roles", ("username", username))
+            if entry is not None:
+                return entry.role_id
+
             user = await User.objects.filter(username=username).get()
-            return user.role_id if user else 1 # Default to user role
+            role_id = user.role_id if user else 1 # Default to user role
+            # Only key by ID once the row belongs to this Telegram user
+            await self._cache_role(role_id, username, user_id if user and user.id == user_id else None)
+            return role_id
         except Exception as e:
             self.logger.error(f"Failed to get user role for @{username}: {str(e)}")
             return 1
 
+    async def load_handler_roster(self) -> HandlerRoster:
+        """Return the handler roster, loading it from the users table when not cached."""
+        async def load():
+            handlers = await User.objects.filter(role_id=2).order_by("id ASC").all()
+            self.logger.info(f"Loaded {len(handlers)} handlers into the roster")
+            return HandlerRoster(handlers)
+
+        try:
+            return await self.cache.get("roster", "handlers", loader=load)
+        except Exception as e:
+            self.logger.error(f"Failed to load handler roster: {str(e)}")
+            raise
+
+    async def _invalidate_roster(self) -> None:
+        """Drop the roster here and on every other replica after a role or handler detail changed."""
+        await self.cache.invalidate("roster", "handlers")
+
+    async def warm_caches(self, recent_days: int = 7, recent_limit: int = 1000) -> Dict[str, int]:
+        """
+        Bulk-load the data the first commands after a start need into the local caches.
+
+        Opens the pool connections, loads the handler roster, caches the roles of staff
+        and recently active users and the open ticket of every user, all concurrently.
+
+        Args:
+            recent_days: How far back a user's last ticket message counts as recent activity.
+            recent_limit: Maximum number of recently active users to load.
+
+        Returns:
+            Number of entries warmed per cache.
+        """
+        try:
+            async def ticket_rows(query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+                if self.shards:
+                    return [row for rows in await self.shards.fan_out("fetch_all", query, params) for row in rows]
+                return await self.fetch_all(query, params)
+
+            _, roster, staff, open_tickets, recent = await asyncio.gather(
+                self.warm_pool(),
+                self.load_handler_roster(),
+                self.fetch_all(GET_STAFF_USERS),
+                ticket_rows(GET_OPEN_TICKET_OWNERS),
+                ticket_rows(GET_RECENT_TICKET_USERS, (recent_days, recent_limit))
+            )
+
+            # Each shard returns its own most recent users
+            recent = sorted(recent, key=lambda row: row["last_seen"], reverse=True)[:recent_limit]
+            users = {row["id"]: row for row in staff}
+            recent_ids = [row["user_id"] for row in recent if row["user_id"] not in users]
+            if recent_ids:
+                query = GET_USERS_BY_IDS.format(placeholders=", ".join(["%s"] * len(recent_ids)))
+                users.update({row["id"]: row for row in await self.fetch_all(query, tuple(recent_ids))})
+
+            for user in users.values():
+                entry = RoleEntry(role_id=user["role_id"], user_id=user["id"], username=user["username"])
+                self.cache.set_local("roles", ("id", user["id"]), entry)
+                if user["username"]:
+                    self.cache.set_local("roles", ("username", user["username"]), entry)
+                    self.cache.set_local("user_ids", user["username"], user["id"])
+
+            # Rows are oldest first, so each user ends up with their latest open ticket
+            for ticket in open_tickets:
+                self.cache.set_local("open_tickets", ticket["user_id"], ticket["ticket_id"])
+                self.cache.set_local("ticket_status", ticket["ticket_id"], "open")
+
+            return {
+                "handlers": len(roster),
+                "users": len(users),
+                "open_tickets": len(open_tickets)
+            }
+        except Exception as e:
+            self.logger.error(f"Failed to warm caches: {str(e)}")
+            raise
+
     async def get_all_handlers(self) -> List[User]:
         try:
-            handlers = await User.objects.filter(role_id=2).all()
+            roster = await self.load_handler_roster()
+            handlers = list(roster.snapshot())
             self.logger.debug(f"Retrieved {len(handlers)} handlers")
             return handlers
         except Exception as e:
@@ -347,7 +792,7 @@ class HandlerTickets(BtAioMysql):
         
     async def is_user_handler(self, user_id: int) -> bool:
         try:
-            return await User.is_handler(user_id)
+            return user_id in await self.load_handler_roster()
         except Exception as e:
             self.logger.error(f"Failed to check handler status for user {user_id}: {str(e)}")
             raise
@@ -389,9 +834,11 @@ class HandlerTickets(BtAioMysql):
                 status=status
             )
             self.logger.info(f"Created ticket {ticket_id} for user {username}")
+            await self.cache.set("open_tickets", user_id, ticket_id)
+            await self._invalidate_history(user_id)
             
             # Start session in Redis
-            await self._update_ticket_session(ticket_id)
+            await self._update_ticket_session(ticket_id, force=True)
             
             return True
         except Exception as e:
@@ -409,7 +856,33 @@ class HandlerTickets(BtAioMysql):
             message: str,
             message_from: str,
             timestamp: str) -> bool:
-        
+        return await self.add_messages_to_ticket(
+            ticket_id=ticket_id,
+            user_id=user_id,
+            message_ids=[(message_id, message_chat_id)],
+            username=username,
+            userfullname=userfullname,
+            message=message,
+            message_from=message_from,
+            timestamp=timestamp
+        )
+
+    async def add_messages_to_ticket(
+            self, 
+            ticket_id: str, 
+            user_id: int, 
+            message_ids: List[Tuple[int, int]],
+            username: str, 
+            userfullname: str, 
+            message: str,
+            message_from: str,
+            timestamp: str) -> bool:
+        """
+        Record several forwarded messages sharing one text, e.g. the parts of an album, in one insert.
+
+        Args:
+            message_ids: ``(message_id, message_chat_id)`` of every forwarded message.
+        """
         timestamp_dt = epodate(timestamp, store=True)
 
         try:
@@ -430,19 +903,22 @@ class HandlerTickets(BtAioMysql):
                     # If registration fails (e.g. race condition), we still try to create the message
                     # as it might have been created by another process in the meantime.
 
-            await TicketMessage.objects.create(
-                ticket_id=ticket_id,
-                user_id=user_id,
-                message_id=message_id,
-                message_chat_id=message_chat_id,
-                username=username,
-                userfullname=userfullname,
-                message=message,
-                message_from=message_from,
-                timestamp=timestamp_dt
-            )
-            self.logger.debug(f"Added message to ticket {ticket_id} by {username}")
-            
+            ticket_messages = await TicketMessage.objects.bulk_create([
+                dict(
+                    ticket_id=ticket_id,
+                    user_id=user_id,
+                    message_id=message_id,
+                    message_chat_id=message_chat_id,
+                    username=username,
+                    userfullname=userfullname,
+                    message=message,
+                    message_from=message_from,
+                    timestamp=timestamp_dt
+                )
+                for message_id, message_chat_id in message_ids
+            ])
+            self.logger.debug(f"Added {len(ticket_messages)} message(s) to ticket {ticket_id} by {username}")
+
             # Extend session in Redis
             await self._update_ticket_session(ticket_id)
             
@@ -462,7 +938,10 @@ class HandlerTickets(BtAioMysql):
     async def get_handler_tickets_history(self, handler_id: int) -> List[Ticket]:
         try:
             # Complex query, using fetch_all and manually converting to Ticket model
-            result = await self.fetch_all(GET_HISTORY_HANDLER_TICKETS, (handler_id,))
+            if self.shards:
+                result = await self.shards.fetch_all_ordered(GET_HISTORY_HANDLER_TICKETS, (handler_id,), ["closed_at ASC"])
+            else:
+                result = await self.fetch_all(GET_HISTORY_HANDLER_TICKETS, (handler_id,))
             tickets = [
                 Ticket(**ticket)
                 for ticket in result
@@ -473,15 +952,45 @@ class HandlerTickets(BtAioMysql):
             self.logger.error(f"Failed to retrieve tickets for user {handler_id}: {str(e)}")
             raise
     
-    async def get_user_tickets_history(self, user_id: int, time_range: str = "today") -> List[Ticket]:
+    def _history_key(self, user_id: int, time_range: str, period: Optional[Tuple[datetime, datetime]] = None):
+        start, _ = period or time_period(time_range)
+        return (user_id, time_range, start.isoformat())
+
+    async def get_cached_history(
+        self, user_id: int, time_range: str, period: Optional[Tuple[datetime, datetime]] = None
+    ) -> Optional[Dict[str, str]]:
+        """Rendered history reply of a user for the given period, the current one by default, if cached."""
+        return await self.cache.get("history", self._history_key(user_id, time_range, period))
+
+    async def cache_history(
+        self, user_id: int, time_range: str, rendered: Dict[str, str], period: Optional[Tuple[datetime, datetime]] = None
+    ) -> None:
+        """Cache a rendered history reply until its period rolls over, capped by the namespace TTL."""
+        period = period or time_period(time_range)
+        remaining = (period[1] - datetime.now(STORE_TIMEZONE).replace(tzinfo=None)).total_seconds()
+        if remaining <= 0:
+            return
+        ttl = min(remaining, self.cache.namespace("history").ttl)
+        await self.cache.set("history", self._history_key(user_id, time_range, period), rendered, ttl=ttl, publish=False)
+
+    async def _invalidate_history(self, *user_ids: int) -> None:
+        await self.cache.invalidate("history", *(
+            self._history_key(user_id, time_range)
+            for user_id in user_ids
+            for time_range in TIME_RANGES.split(",")
+        ))
+
+    async def get_user_tickets_history(
+        self, user_id: int, time_range: str = "today", period: Optional[Tuple[datetime, datetime]] = None
+    ) -> List[Ticket]:
         try:
-            time_range_query = await self._query_time_range("created_at", time_range)
+            start, end = period or time_period(time_range)
             query = (
                 f"{GET_HISTORY_USER_TICKETS} "
-                f"{time_range_query} "
+                "AND created_at >= %s AND created_at < %s "
                 "ORDER BY created_at ASC"
             )
-            result = await self.fetch_all(query, (user_id,))
+            result = await self._ticket_db(user_id).fetch_all(query, (user_id, start, end))
             tickets = [
                 Ticket(**ticket)
                 for ticket in result
@@ -502,26 +1011,114 @@ class HandlerTickets(BtAioMysql):
             raise
     
     async def close_ticket(self, ticket_id: str, handler_id: int, handler_username: str, timezone: str) -> bool:
-        current_time = curtime(timezone)
+        """
+        Close a single ticket if it is still open.
+
+        Returns:
+            False if the ticket does not exist or was already closed, by someone else in
+            the meantime included.
+        """
         try:
-            ticket = await Ticket.objects.get(ticket_id=ticket_id)
-            if ticket:
-                await ticket.close(handler_id, handler_username)
-                self.logger.info(f"Ticket {ticket_id} closed by handler {handler_username}")
-                
-                # Clear Redis session if it exists
-                if self.redis:
-                    await self.redis.client.delete(f"ticket_session:{ticket_id}")
-                
-                return True
-            return False
+            db = await self.shards.locate_ticket(ticket_id) if self.shards else self
+            if not db:
+                return False
+            closed_at = datetime.now().replace(microsecond=0)
+            tickets = await self._close_on(db, [ticket_id], handler_id, handler_username, closed_at)
+            if not tickets:
+                return False
+            await self._forget_closed_tickets(tickets)
+            self.logger.info(f"Ticket {ticket_id} closed by handler {handler_username}")
+
+            # Clear Redis session if it exists
+            if self.redis:
+                async with self.redis.client.pipeline(transaction=False) as pipe:
+                    pipe.delete(f"ticket_session:{ticket_id}")
+                    pipe.zrem(SESSION_EXPIRY_KEY, ticket_id)
+                    await pipe.execute()
+
+            return True
         except Exception as e:
             self.logger.error(f"Failed to close ticket {ticket_id}: {str(e)}")
             raise
     
+    async def _forget_closed_tickets(self, tickets: List[Ticket]) -> None:
+        """Update the caches after ``tickets`` were closed, with one invalidation per cache."""
+        user_ids = {int(ticket.user_id) for ticket in tickets}
+        await self.cache.invalidate("open_tickets", *user_ids)
+        await self._invalidate_history(*user_ids)
+        # One broadcast drops the other replicas' "open" entries, the closed rows are cached here
+        await self.cache.invalidate("ticket_status", *(ticket.ticket_id for ticket in tickets))
+        await self.cache.invalidate("transcripts", *(ticket.ticket_id for ticket in tickets))
+        for ticket in tickets:
+            await self._cache_ticket_status(ticket.ticket_id, ticket)
+            self._session_refreshed.delete(ticket.ticket_id)
+
+    async def close_tickets(self, ticket_ids: List[str], handler_id: int, handler_username: str) -> List[Ticket]:
+        """
+        Close several tickets with a single UPDATE per database.
+
+        The open tickets are locked with ``SELECT ... FOR UPDATE`` in the same transaction
+        as the UPDATE, so a ticket closed by someone else in between is skipped, as are
+        tickets that are already closed or do not exist.
+
+        Returns:
+            The tickets that were closed.
+        """
+        closed_at = datetime.now().replace(microsecond=0)
+        try:
+            if not ticket_ids:
+                return []
+            targets = list(self.shards.shards) if self.shards else [self]
+            tickets = [
+                ticket
+                for closed in await asyncio.gather(*(
+                    self._close_on(db, ticket_ids, handler_id, handler_username, closed_at) for db in targets
+                ))
+                for ticket in closed
+            ]
+            if tickets:
+                await self._forget_closed_tickets(tickets)
+                self.logger.info(f"Closed {len(tickets)} tickets by handler {handler_username}")
+
+            if self.redis:
+                await self.redis.client.delete(*(f"ticket_session:{ticket_id}" for ticket_id in ticket_ids))
+            return tickets
+        except Exception as e:
+            self.logger.error(f"Failed to close {len(ticket_ids)} tickets: {str(e)}")
+            raise
+
+    @staticmethod
+    async def _close_on(
+        db: BtAioMysql, ticket_ids: List[str], handler_id: int, handler_username: str, closed_at: datetime
+    ) -> List[Ticket]:
+        """Lock the open tickets among ``ticket_ids`` on ``db`` and close them in one transaction."""
+        placeholders = ", ".join(["%s"] * len(ticket_ids))
+        async with db.transaction() as conn:
+            async with conn.cursor() as cursor:
+                with db.timed_query():
+                    await cursor.execute(LOCK_OPEN_TICKETS.format(placeholders=placeholders), tuple(ticket_ids))
+                    rows = await cursor.fetchall()
+                    if not rows:
+                        return []
+                    locked = [row["ticket_id"] for row in rows]
+                    await cursor.execute(
+                        CLOSE_TICKETS.format(placeholders=", ".join(["%s"] * len(locked))),
+                        (handler_id, handler_username, closed_at, *locked)
+                    )
+        return [
+            Ticket(**{**row, "status": "closed", "handler_id": handler_id,
+                      "handler_username": handler_username, "closed_at": closed_at})
+            for row in rows
+        ]
+
     async def get_closed_ticket_by_ticketid(self, id: str):
         try:
+            cached_status = await self.cache.get("ticket_status", id)
+            if cached_status is not None:
+                return cached_status if isinstance(cached_status, Ticket) else None
+
             ticket = await Ticket.objects.filter(ticket_id=id, status='closed').get()
+            await self._cache_ticket_status(id, ticket)
             return ticket
         except Exception as e:
             self.logger.error(f"Failed to retrieve ticket {id}: {str(e)}")
@@ -536,6 +1133,21 @@ class HandlerTickets(BtAioMysql):
             self.logger.error(f"Failed to retrieve tickets for user {user_id}: {str(e)}")
             raise
 
+    async def get_open_ticket_id(self, user_id: int) -> Optional[str]:
+        """
+        Return the ID of the user's current open ticket, if any.
+        Served from the open-ticket cache, falling back to the database on a miss.
+        """
+        try:
+            async def load():
+                ticket = await Ticket.objects.filter(user_id=user_id, status='open').order_by("created_at DESC").get()
+                return ticket.ticket_id if ticket else None
+
+            return await self.cache.get("open_tickets", user_id, loader=load)
+        except Exception as e:
+            self.logger.error(f"Failed to retrieve open ticket for user {user_id}: {str(e)}")
+            raise
+
     async def get_closed_tickets(self, user_id: int) -> List[Ticket]:
         try:
             tickets = await Ticket.objects.filter(user_id=user_id, status='closed').order_by("closed_at DESC").all()
@@ -0,0 +1,22 @@
+from typing import List, Optional
+from telebot.types import Update
+from telebot.async_telebot import AsyncTeleBot
+
+from src.library.dedup import UpdateDeduplicator
+
+
+class BtTeleBot(AsyncTeleBot):
+    """
+    AsyncTeleBot that skips updates already processed before any handler runs.
+    """
+
+    def __init__(self, *args, deduplicator: Optional[UpdateDeduplicator] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deduplicator = deduplicator
+
+    async def process_new_updates(self, updates: List[Update]):
+        if self.deduplicator is not None and updates:
+            updates = await self.deduplicator.filter(updates)
+            if not updates:
+                return
+        await super().process_new_updates(updates)
@@ -0,0 +1,416 @@
+import json
+import time
+import asyncio
+from uuid import uuid4
+from collections import OrderedDict
+from loguru import logger
+from redis.exceptions import RedisError
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from src.library.redis import BtRedis
+from src.library.codec import CodecError
+from src.types.data_store import CacheNamespace
+
+
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after a time-to-live."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300):
+        """Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Default time-to-live in seconds, None to keep entries until evicted
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._store: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._store.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._store.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._store[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._store.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry without counting a hit or miss or refreshing its recency."""
+        entry = self._store.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value``; ``ttl`` overrides the default time-to-live (``math.inf`` never expires)."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        self._store[key] = (expires_at, value)
+        self._store.move_to_end(key)
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> Any:
+        entry = self._store.pop(key, None)
+        return entry[1] if entry else None
+
+    def delete_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Drop every entry for which ``predicate(key, value)`` is true."""
+        keys = [key for key, (_, value) in self._store.items() if predicate(key, value)]
+        for key in keys:
+            del self._store[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class _Negative:
+    """Marker stored in place of a value that is known not to exist."""
+
+
+_NEGATIVE = _Negative()
+# Codec payloads start with the codec version, which is never zero
+_NEGATIVE_MARK = b"\x00none"
+
+
+class TwoTierCache:
+    """
+    Cache with an in-process LRU (L1) in front of Redis (L2), shared by every bot replica.
+
+    Each namespace has its own TTLs and encoding. Writes and invalidations are published
+    on a Redis channel so other replicas drop their L1 copy, lookups of absent values can
+    be cached negatively, and concurrent misses on the same key share one load.
+    Namespaces registered with ``shared=False`` stay in L1 and only use the channel.
+    Without a Redis connection the cache degrades to L1 only.
+    """
+
+    def __init__(self, redis: Optional[BtRedis] = None, channel: str = "bt:cache:invalidate", prefix: str = "bt:cache"):
+        """Initialize the cache.
+
+        Args:
+            redis: Redis wrapper used for L2 and the invalidation channel
+            channel: Pub/sub channel carrying invalidations between replicas
+            prefix: Prefix of the L2 keys
+        """
+        self.redis = redis
+        self.channel = channel
+        self.prefix = prefix
+        self.logger = logger
+        self.instance_id = uuid4().hex
+        self._namespaces: Dict[str, CacheNamespace] = {}
+        self._local: Dict[str, TTLCache] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._epochs: Dict[Tuple[str, str], int] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def register(self, namespace: CacheNamespace) -> None:
+        local_ttl = namespace.local_ttl if namespace.local_ttl is not None else namespace.ttl
+        self._namespaces[namespace.name] = namespace
+        self._local[namespace.name] = TTLCache(maxsize=namespace.maxsize, ttl=local_ttl)
+        self._counters[namespace.name] = {"l2_hits": 0, "l2_misses": 0, "l2_errors": 0, "loads": 0}
+
+    def namespace(self, name: str) -> CacheNamespace:
+        return self._namespaces[name]
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return ":".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+
+    def _redis_key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def _shared(self, namespace: CacheNamespace) -> bool:
+        return namespace.shared and self._connected
+
+    @property
+    def _connected(self) -> bool:
+        return self.redis is not None and self.redis.connected
+
+    def _encode(self, namespace: CacheNamespace, value: Any) -> bytes:
+        if value is _NEGATIVE:
+            return _NEGATIVE_MARK
+        return (namespace.encode or self.redis.codec.encode)(value)
+
+    def _decode(self, namespace: CacheNamespace, raw: bytes) -> Any:
+        if raw == _NEGATIVE_MARK:
+            return _NEGATIVE
+        return (namespace.decode or self.redis.codec.decode)(raw)
+
+    async def get(
+            self,
+            namespace: str,
+            key: Hashable,
+            loader: Optional[Callable[[], Awaitable[Any]]] = None,
+            default: Any = None) -> Any:
+        """
+        Look a key up in L1, then L2, then through ``loader``.
+
+        Args:
+            namespace: Registered namespace name.
+            key: Cache key; tuples are joined with ``:``.
+            loader: Coroutine function loading the value from the source of truth on a miss.
+                A ``None`` result is cached negatively when the namespace has a ``negative_ttl``.
+            default: Returned on a miss without a loader.
+
+        Returns:
+            The cached or loaded value, None for a negative entry, otherwise ``default``.
+        """
+        ns = self._namespaces[namespace]
+        local = self._local[namespace]
+        cache_key = self._key(key)
+
+        value = local.get(cache_key, MISSING)
+        if value is MISSING and self._shared(ns):
+            value = await self._get_l2(ns, cache_key)
+        if value is not MISSING:
+            return None if value is _NEGATIVE else value
+
+        if loader is None:
+            return default
+        return await self._load(ns, cache_key, loader)
+
+    async def _get_l2(self, namespace: CacheNamespace, key: str) -> Any:
+        counters = self._counters[namespace.name]
+        try:
+            raw = await self.redis.get_cached(self._redis_key(namespace.name, key))
+        except (RedisError, OSError) as e:
+            counters["l2_errors"] += 1
+            self.logger.warning(f"Cache L2 read of {namespace.name}:{key} failed: {e}")
+            return MISSING
+
+        try:
+            value = self._decode(namespace, raw) if raw is not None else MISSING
+        except CodecError as e:
+            # Written by a newer deploy; reload it from the source of truth
+            self.logger.debug(f"Ignoring undecodable cache entry {namespace.name}:{key}: {e}")
+            value = MISSING
+        if value is MISSING:
+            counters["l2_misses"] += 1
+            return MISSING
+        counters["l2_hits"] += 1
+        self._local[namespace.name].set(key, value, ttl=self._local_ttl(namespace, value))
+        return value
+
+    async def _load(self, namespace: CacheNamespace, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``loader`` once for concurrent misses on the same key and cache its result."""
+        flight = (namespace.name, key)
+        future = self._inflight.get(flight)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight] = future
+        epoch = self._epochs.get(flight, 0)
+        try:
+            self._counters[namespace.name]["loads"] += 1
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(flight, None)
+
+        future.set_result(value)
+        # An invalidation during the load means the value may already be stale
+        if self._epochs.get(flight, 0) == epoch and (value is not None or namespace.negative_ttl is not None):
+            await self.set(namespace.name, key, value, publish=False)
+        return value
+
+    def _local_ttl(self, namespace: CacheNamespace, value: Any) -> Optional[float]:
+        if value is _NEGATIVE:
+            return namespace.negative_ttl
+        return None
+
+    def set_local(self, namespace: str, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value in this replica's L1 only, e.g. to warm it from a row already at hand."""
+        self._local[namespace].set(self._key(key), _NEGATIVE if value is None else value, ttl=ttl)
+
+    async def set(
+            self,
+            namespace: str,
+            key: Hashable,
+            value: Any,
+            ttl: Optional[float] = None,
+            publish: bool = True) -> None:
+        """
+        Store a value in L1 and L2.
+
+        Args:
+            namespace: Registered namespace name.
+            key: Cache key.
+            value: Value to store; None stores a negative entry.
+            ttl: Overrides the namespace TTL (``math.inf`` never expires).
+            publish: Tell other replicas to drop their L1 copy; leave it off when the value
+                was just read from the source of truth.
+        """
+        ns = self._namespaces[namespace]
+        cache_key = self._key(key)
+        value = _NEGATIVE if value is None else value
+        if value is _NEGATIVE:
+            ttl = ns.negative_ttl
+        self._local[namespace].set(cache_key, value, ttl=ttl if ttl is not None else self._local_ttl(ns, value))
+
+        if self._shared(ns):
+            expire = ttl if ttl is not None else ns.ttl
+            redis_key = self._redis_key(namespace, cache_key)
+            try:
+                await self.redis.raw.set(
+                    redis_key,
+                    self._encode(ns, value),
+                    ex=int(expire) if expire is not None and expire != float("inf") else None
+                )
+                self.redis.untrack(redis_key)
+            except (RedisError, OSError) as e:
+                self._counters[namespace]["l2_errors"] += 1
+                self.logger.warning(f"Cache L2 write of {namespace}:{cache_key} failed: {e}")
+        if publish:
+            await self._publish(namespace, [cache_key])
+
+    async def invalidate(self, namespace: str, *keys: Hashable) -> None:
+        """Drop keys from L1 and L2 here and from L1 on every other replica."""
+        ns = self._namespaces[namespace]
+        cache_keys = [self._key(key) for key in keys]
+        if not cache_keys:
+            return
+        self._drop_local(namespace, cache_keys)
+
+        if self._shared(ns):
+            try:
+                redis_keys = [self._redis_key(namespace, key) for key in cache_keys]
+                await self.redis.client.delete(*redis_keys)
+                self.redis.untrack(*redis_keys)
+            except (RedisError, OSError) as e:
+                self._counters[namespace]["l2_errors"] += 1
+                self.logger.warning(f"Cache L2 delete in {namespace} failed: {e}")
+        await self._publish(namespace, cache_keys)
+
+    async def clear(self, namespace: str) -> None:
+        """Drop a whole namespace from L1 and L2 here and from L1 on every other replica."""
+        ns = self._namespaces[namespace]
+        self._local[namespace].clear()
+
+        if self._shared(ns):
+            try:
+                keys = [key async for key in self.redis.client.scan_iter(match=self._redis_key(namespace, "*"), count=500)]
+                for start in range(0, len(keys), 500):
+                    await self.redis.client.delete(*keys[start:start + 500])
+                if keys:
+                    self.redis.untrack(*keys)
+            except (RedisError, OSError) as e:
+                self._counters[namespace]["l2_errors"] += 1
+                self.logger.warning(f"Cache L2 clear of {namespace} failed: {e}")
+        await self._publish(namespace, None)
+
+    def _drop_local(self, namespace: str, keys: Optional[list]) -> None:
+        local = self._local.get(namespace)
+        if local is None:
+            return
+        if keys is None:
+            local.clear()
+            return
+        for key in keys:
+            local.delete(key)
+            flight = (namespace, key)
+            self._epochs[flight] = self._epochs.get(flight, 0) + 1
+            if flight not in self._inflight:
+                # Only loads in progress need the epoch; keep the map from growing
+                self._epochs.pop(flight, None)
+
+    async def _publish(self, namespace: str, keys: Optional[list]) -> None:
+        if not self._connected:
+            return
+        payload = json.dumps({"origin": self.instance_id, "namespace": namespace, "keys": keys})
+        try:
+            await self.redis.client.publish(self.channel, payload)
+        except (RedisError, OSError) as e:
+            self.logger.warning(f"Failed to publish cache invalidation for {namespace}: {e}")
+
+    async def start(self) -> None:
+        """Start listening for invalidations from other replicas."""
+        if self._listener is None and self._connected:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self.logger.info(f"Listening for cache invalidations on {self.channel}")
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"Cache invalidation listener failed, retrying: {e}")
+                # Invalidations may have been missed while disconnected
+                for local in self._local.values():
+                    local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _apply(self, data: str) -> None:
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            self.logger.warning(f"Ignoring malformed cache invalidation: {data!r}")
+            return
+        if payload.get("origin") == self.instance_id:
+            return
+        self._drop_local(payload.get("namespace"), payload.get("keys"))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {**self._local[name].stats(), **self._counters[name]}
+            for name in self._namespaces
+        }
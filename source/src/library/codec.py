@@ -0,0 +1,141 @@
+import msgpack
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, FrozenSet, Optional, Tuple, Type
+
+try:
+    import zstandard
+except ImportError:  # Compression is optional
+    zstandard = None
+
+
+CODEC_VERSION = 1
+
+FLAG_ZSTD = 0x01
+
+EXT_OBJECT = 1
+EXT_DATETIME = 2
+EXT_DATE = 3
+EXT_DECIMAL = 4
+
+_OBJECT_MARKER = msgpack.ExtType(EXT_OBJECT, b"")
+_OBJECT = object()
+
+
+class CodecError(ValueError):
+    """Raised when a stored value cannot be decoded by this version of the bot."""
+
+
+class Codec:
+    """
+    Compact binary serialization of Redis values.
+
+    Values are packed with msgpack behind a two byte header holding the codec version
+    and flags. Registered ``Model`` classes and dataclasses travel as arrays tagged with
+    an extension marker, their type name and schema version, and payloads above the
+    compression threshold are compressed with zstd when ``zstandard`` is installed.
+
+    Decoding is forward compatible within a schema: values written with an older schema
+    version of a type are accepted, unknown dataclass fields are dropped, and values
+    from a newer codec or schema version raise ``CodecError`` so callers can treat them
+    as a cache miss during a rolling deploy.
+    """
+
+    def __init__(self, compress_threshold: Optional[int] = 1024, compress_level: int = 3):
+        """Initialize the codec.
+
+        Args:
+            compress_threshold: Payload size in bytes from which values are compressed, None to never compress
+            compress_level: zstd compression level
+        """
+        self.compress_threshold = compress_threshold if zstandard else None
+        # name -> (class, schema version, dataclass field names or None for models)
+        self._types: Dict[str, Tuple[Type, int, Optional[FrozenSet[str]]]] = {}
+        self._names: Dict[Type, Tuple[str, int, Optional[Tuple[str, ...]]]] = {}
+        self._packer = msgpack.Packer(default=self._default, use_bin_type=True, datetime=False)
+        self._compressor = zstandard.ZstdCompressor(level=compress_level) if zstandard else None
+        self._decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+    def register(self, cls: Type, name: Optional[str] = None, version: int = 1) -> Type:
+        """Make a ``Model`` subclass or dataclass encodable; bump ``version`` when its fields change meaning."""
+        name = name or cls.__name__
+        field_names = tuple(field.name for field in fields(cls)) if is_dataclass(cls) else None
+        self._types[name] = (cls, version, frozenset(field_names) if field_names is not None else None)
+        self._names[cls] = (name, version, field_names)
+        return cls
+
+    def _default(self, value: Any) -> Any:
+        registered = self._names.get(type(value))
+        if registered is not None:
+            name, version, field_names = registered
+            if field_names is not None:
+                state = {field: getattr(value, field) for field in field_names}
+            else:
+                state = vars(value)
+            # Packed inline by the same pass, so nested objects cost no extra packb call
+            return [_OBJECT_MARKER, name, version, state]
+        if isinstance(value, datetime):
+            return msgpack.ExtType(EXT_DATETIME, value.isoformat().encode())
+        if isinstance(value, date):
+            return msgpack.ExtType(EXT_DATE, value.isoformat().encode())
+        if isinstance(value, Decimal):
+            return msgpack.ExtType(EXT_DECIMAL, str(value).encode())
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+        raise TypeError(f"Cannot encode value of type {type(value).__name__}; register it with the codec")
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == EXT_OBJECT:
+            return _OBJECT
+        if code == EXT_DATETIME:
+            return datetime.fromisoformat(data.decode())
+        if code == EXT_DATE:
+            return date.fromisoformat(data.decode())
+        if code == EXT_DECIMAL:
+            return Decimal(data.decode())
+        return msgpack.ExtType(code, data)
+
+    def _list_hook(self, items: list) -> Any:
+        if not items or items[0] is not _OBJECT:
+            return items
+
+        _, name, version, state = items
+        if name not in self._types:
+            raise CodecError(f"Unknown type '{name}'")
+        cls, current, known = self._types[name]
+        if version > current:
+            raise CodecError(f"'{name}' was written with schema v{version}, this version reads up to v{current}")
+        if known is not None and not known.issuperset(state):
+            state = {key: value for key, value in state.items() if key in known}
+        return cls(**state)
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._packer.pack(value)
+        flags = 0
+        if self.compress_threshold is not None and len(payload) >= self.compress_threshold:
+            compressed = self._compressor.compress(payload)
+            if len(compressed) < len(payload):
+                payload, flags = compressed, flags | FLAG_ZSTD
+        return bytes((CODEC_VERSION, flags)) + payload
+
+    def decode(self, data: bytes) -> Any:
+        if len(data) < 2:
+            raise CodecError("Value is too short to carry a codec header")
+        version, flags = data[0], data[1]
+        if version > CODEC_VERSION:
+            raise CodecError(f"Value was written with codec v{version}, this version reads up to v{CODEC_VERSION}")
+
+        payload = data[2:]
+        if flags & FLAG_ZSTD:
+            if self._decompressor is None:
+                raise CodecError("Value is zstd compressed but zstandard is not installed")
+            payload = self._decompressor.decompress(payload)
+        try:
+            return msgpack.unpackb(
+                payload, ext_hook=self._ext_hook, list_hook=self._list_hook, raw=False, strict_map_key=False
+            )
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f"Malformed value: {e}") from e
@@ -1,80 +1,268 @@
+import time
+import heapq
 import asyncio
 from loguru import logger
-from typing import Optional, Dict, Any, List, Tuple
-from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 
 import aiomysql
 from aiomysql import create_pool, DictCursor
 from aiomysql.utils import _PoolContextManager
+from pymysql.constants import CLIENT
 from src.localization.config import config
+from src.types.config import DatabaseConfig
+from src.library.limiter import AdaptiveLimiter
+
+
+# Durations of the statements run on the connection the current task holds
+_query_times: ContextVar[Optional[List[float]]] = ContextVar("query_times", default=None)
+
+
+def merge_ordered(results: Iterable[List[Dict[str, Any]]], order_by: List[str]) -> List[Dict[str, Any]]:
+    """Merge per-shard result sets that are each ordered by the same ORDER BY clause.
+
+    Args:
+        results: One ordered list of rows per shard.
+        order_by: ORDER BY fields as written in the query, e.g. ``["created_at DESC"]``.
+
+    Returns:
+        A single list ordered like the query would be on one database.
+    """
+    results = list(results)
+    if not order_by:
+        return [row for rows in results for row in rows]
+
+    fields, descending = [], []
+    for clause in order_by:
+        parts = clause.split()
+        fields.append(parts[0])
+        descending.append(len(parts) > 1 and parts[1].upper() == "DESC")
+
+    # MySQL sorts NULLs first in ascending order
+    def key(*names):
+        return lambda row: tuple((row.get(name) is not None, row.get(name)) for name in names)
+
+    if len(set(descending)) == 1:
+        return list(heapq.merge(*results, key=key(*fields), reverse=descending[0]))
+
+    rows = [row for rows in results for row in rows]
+    for name, desc in reversed(list(zip(fields, descending))):
+        rows.sort(key=key(name), reverse=desc)
+    return rows
 
 
 class BtAioMysql:
     """Asynchronous MySQL connection manager with connection pooling."""
     
-    def __init__(self, retries: int = 3, retry_delay: int = 5, pool_size: int = 10, connect_timeout: int = 10):
+    def __init__(self, retries: int = 3, retry_delay: int = 5, pool_size: int = 10, connect_timeout: int = 10,
+                 database: Optional[DatabaseConfig] = None, max_pool_size: int = 50, min_concurrency: int = 2,
+                 target_latency: float = 0.05, idle_timeout: int = 300):
         """Initialize the MySQL connection manager.
         
         Args:
             retries: Number of retries for transient errors
             retry_delay: Delay between retries in seconds
-            pool_size: Maximum number of connections in the pool
+            pool_size: Initial concurrency limit
             connect_timeout: Connection timeout in seconds
+            database: Database to connect to. Defaults to the ``database`` section of the config
+            max_pool_size: Maximum number of connections in the pool, and ceiling of the concurrency limit
+            min_concurrency: Floor of the concurrency limit
+            target_latency: Query latency in seconds under which the concurrency limit may grow
+            idle_timeout: Seconds without queries after which idle connections are closed
         """
         self.config = config
+        self.database: DatabaseConfig = database or self.config.database
+        self.shards = None  # ShardRouter, set when ticket data is sharded
         self.pool: Optional[_PoolContextManager] = None
+        self.batch_pool: Optional[_PoolContextManager] = None  # multi-statement connections for fetch_batch
         self.logger = logger
         self.retries = retries
         self.retry_delay = retry_delay
         self.pool_size = pool_size
+        self.max_pool_size = max(pool_size, max_pool_size)
         self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.limiter = AdaptiveLimiter(
+            initial_limit=pool_size,
+            min_limit=min_concurrency,
+            max_limit=self.max_pool_size,
+            target_latency=target_latency
+        )
+        self._last_activity: float = time.monotonic()
+        self._reaper: Optional[asyncio.Task] = None
+        # Pools are created on first use; concurrent first callers must not each create one
+        self._connect_lock = asyncio.Lock()
     
+    async def _create_pool(self, client_flag: int = 0, maxsize: Optional[int] = None) -> _PoolContextManager:
+        return await create_pool(
+            host=self.database.host,
+            port=self.database.port,
+            user=self.database.user,
+            password=self.database.password,
+            db=self.database.database,
+            charset='utf8mb4',
+            cursorclass=DictCursor,
+            autocommit=True,
+            client_flag=client_flag,
+            minsize=1,
+            maxsize=maxsize or self.max_pool_size,
+            connect_timeout=self.connect_timeout
+        )
+
     async def connect(self) -> None:
         """Establish connection pool to the MySQL database."""
         try:
-            self.pool = await create_pool(
-                host=self.config.database.host,
-                port=self.config.database.port,
-                user=self.config.database.user,
-                password=self.config.database.password,
-                db=self.config.database.database,
-                charset='utf8mb4',
-                cursorclass=DictCursor,
-                autocommit=True,
-                minsize=1,
-                maxsize=self.pool_size,
-                connect_timeout=self.connect_timeout
-            )
-            self.logger.info(f"MySQL connection pool established to {self.config.database.host}")
+            self.pool = await self._create_pool()
+            self.logger.info(f"MySQL connection pool established to {self.database.host}")
+            if not self._reaper or self._reaper.done():
+                self._reaper = asyncio.create_task(self._reap_idle_connections())
         except Exception as e:
             self.logger.error(f"Failed to establish MySQL connection: {str(e)}")
             raise
-    
+
+    async def connect_batch(self) -> None:
+        """Establish the pool of multi-statement connections used by ``fetch_batch`` only.
+
+        The flag stays off the main pool, so no other query can carry stacked statements.
+        """
+        try:
+            # Sized like the main pool, so the shared concurrency limit is what bounds it
+            self.batch_pool = await self._create_pool(CLIENT.MULTI_STATEMENTS)
+        except Exception as e:
+            self.logger.error(f"Failed to establish MySQL multi-statement connection: {str(e)}")
+            raise
+
     async def close(self) -> None:
         """Close the connection pool."""
+        if self.shards:
+            await self.shards.close()
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
         if self.pool:
             self.pool.close()
             await self.pool.wait_closed()
             self.logger.info("MySQL connection pool closed")
             self.pool = None
+        if self.batch_pool:
+            self.batch_pool.close()
+            await self.batch_pool.wait_closed()
+            self.batch_pool = None
     
-    @asynccontextmanager
-    async def transaction(self):
-        """Context manager for handling transactions with automatic commit/rollback."""
+    async def warm_pool(self, size: Optional[int] = None) -> None:
+        """Open pooled connections up front, up to the initial concurrency limit by default."""
         if not self.pool:
             await self.connect()
+        size = min(size or int(self.limiter.limit), self.max_pool_size)
+        missing = size - self.pool.size
+        if missing > 0:
+            connections = []
 
-        conn = await self.pool.acquire()
+            async def open_one():
+                connections.append(await self.pool.acquire())
+
+            # Release whatever was opened even when a caller's timeout cancels the warm-up
+            try:
+                await asyncio.gather(*(open_one() for _ in range(missing)))
+            finally:
+                for conn in connections:
+                    self.pool.release(conn)
+            self._last_activity = time.monotonic()
+        if self.shards:
+            await asyncio.gather(*(shard.warm_pool(size) for shard in self.shards.shards))
+
+    def metrics(self) -> Dict[str, int]:
+        """Current concurrency limit, in-flight and queued queries, and pool usage."""
+        return {
+            **self.limiter.metrics(),
+            "pool_size": self.pool.size if self.pool else 0,
+            "pool_free": self.pool.freesize if self.pool else 0,
+            "batch_pool_size": self.batch_pool.size if self.batch_pool else 0,
+            "batch_pool_free": self.batch_pool.freesize if self.batch_pool else 0
+        }
+
+    async def _reap_idle_connections(self) -> None:
+        """Close idle pooled connections once no query has run for ``idle_timeout`` seconds."""
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            try:
+                idle_for = time.monotonic() - self._last_activity
+                if self.pool and self.limiter.in_flight == 0 and idle_for >= self.idle_timeout:
+                    freed = 0
+                    for pool in (self.pool, self.batch_pool):
+                        if pool and pool.freesize:
+                            freed += pool.freesize
+                            await pool.clear()
+                    if freed:
+                        self.logger.debug(f"Closed {freed} idle MySQL connections to {self.database.host}")
+                self.logger.debug(f"MySQL pool metrics for {self.database.host}: {self.metrics()}")
+            except Exception as e:
+                self.logger.warning(f"Failed to shrink MySQL pool: {e}")
+
+    @asynccontextmanager
+    async def connection(self, multi_statements: bool = False):
+        """Acquire a pooled connection under the adaptive concurrency limit.
+
+        The limit adapts to the time spent in statements wrapped in ``timed_query``, not to
+        waiting for a connection or to the caller's own work while holding one.
+
+        Args:
+            multi_statements: Take the connection from the multi-statement pool instead
+        """
+        if not (self.batch_pool if multi_statements else self.pool):
+            async with self._connect_lock:
+                if multi_statements and not self.batch_pool:
+                    await self.connect_batch()
+                elif not multi_statements and not self.pool:
+                    await self.connect()
+        pool = self.batch_pool if multi_statements else self.pool
+
+        await self.limiter.acquire()
+        query_times: List[float] = []
+        token = _query_times.set(query_times)
+        failed = False
         try:
-            await conn.begin()
-            yield conn
-            await conn.commit()
-        except Exception as e:
-            await conn.rollback()
-            logger.error(f"Transaction failed and rolled back: {e}")
+            conn = await pool.acquire()
+            try:
+                yield conn
+            finally:
+                pool.release(conn)
+        except (aiomysql.OperationalError, aiomysql.InterfaceError, ConnectionError, asyncio.TimeoutError):
+            # Connection and timeout failures mean the server is struggling; query errors
+            # such as a duplicate key say nothing about load
+            failed = True
             raise
         finally:
-            self.pool.release(conn)
+            _query_times.reset(token)
+            self._last_activity = time.monotonic()
+            self.limiter.release(sum(query_times) if query_times else None, failed)
+
+    @staticmethod
+    @contextmanager
+    def timed_query():
+        """Count the enclosed statement towards the latency the concurrency limit adapts to."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            query_times = _query_times.get()
+            if query_times is not None:
+                query_times.append(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Context manager for handling transactions with automatic commit/rollback."""
+        async with self.connection() as conn:
+            try:
+                await conn.begin()
+                yield conn
+                with self.timed_query():
+                    await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                logger.error(f"Transaction failed and rolled back: {e}")
+                raise
 
     async def _retry_on_failure(self, func, *args, **kwargs):
         """Retry logic for transient MySQL errors."""
@@ -105,7 +293,8 @@ class BtAioMysql:
         async def _exec():
             async with self.transaction() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute(query, params or ())
+                    with self.timed_query():
+                        await cursor.execute(query, params or ())
                     return cursor.rowcount
 
         return await self._retry_on_failure(_exec)
@@ -122,15 +311,11 @@ class BtAioMysql:
             Single row as dictionary or None if no results.
         """
         async def _fetch():
-            if not self.pool:
-                await self.connect()
-            conn = await self.pool.acquire()
-            try:
+            async with self.connection() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute(query, params or ())
-                    return await cursor.fetchone()
-            finally:
-                self.pool.release(conn)
+                    with self.timed_query():
+                        await cursor.execute(query, params or ())
+                        return await cursor.fetchone()
 
         return await self._retry_on_failure(_fetch)
     
@@ -146,15 +331,48 @@ class BtAioMysql:
             List of rows as dictionaries.
         """
         async def _fetch():
-            if not self.pool:
-                await self.connect()
-            conn = await self.pool.acquire()
-            try:
+            async with self.connection() as conn:
                 async with conn.cursor() as cursor:
-                    await cursor.execute(query, params or ())
-                    return await cursor.fetchall()
-            finally:
-                self.pool.release(conn)
+                    with self.timed_query():
+                        await cursor.execute(query, params or ())
+                        return await cursor.fetchall()
+
+        return await self._retry_on_failure(_fetch)
+
+    async def fetch_batch(self, statements: List[Tuple[str, Tuple]]) -> List[List[Dict[str, Any]]]:
+        """
+        Execute several independent SELECT statements in a single round trip.
+
+        Each statement is rendered with its parameters and the whole batch is sent
+        as one multi-statement query, then the result sets are read back in order.
+
+        Args:
+            statements: List of (query, params) pairs.
+
+        Returns:
+            One list of rows per statement, in the same order as the statements.
+        """
+        if not statements:
+            return []
+
+        async def _fetch():
+            async with self.connection(multi_statements=True) as conn:
+                try:
+                    async with conn.cursor() as cursor:
+                        batch = ";\n".join(
+                            cursor.mogrify(query.strip().rstrip(";"), params or ())
+                            for query, params in statements
+                        )
+                        with self.timed_query():
+                            await cursor.execute(batch)
+                            results = [list(await cursor.fetchall())]
+                            while await cursor.nextset():
+                                results.append(list(await cursor.fetchall()))
+                        return results
+                except BaseException:
+                    # Result sets may be left unread; never hand such a connection back to the pool
+                    conn.close()
+                    raise
 
         return await self._retry_on_failure(_fetch)
     
@@ -187,6 +405,33 @@ class Manager:
     def db(self):
         return self.model_class.db
 
+    async def _targets(self, values: Dict[str, Any]) -> List[BtAioMysql]:
+        """Pick the database(s) holding the rows matched by ``values``."""
+        router = self.db.shards
+        if not router or not self.model_class._shard_keys:
+            return [self.db]
+        shard = await router.route(self.model_class._shard_keys, values)
+        return [shard] if shard else list(router.shards)
+
+    def _conditions(self, params: List[Any]) -> List[str]:
+        """WHERE conditions for the filters, appending their values to ``params``.
+
+        A ``<column>__in`` filter takes a sequence and matches any of its values.
+        """
+        conditions = []
+        for key, value in self.filters.items():
+            if key.endswith("__in"):
+                values = list(value)
+                if not values:
+                    conditions.append("1 = 0")
+                    continue
+                conditions.append(f"{key[:-4]} IN ({', '.join(['%s'] * len(values))})")
+                params.extend(values)
+            else:
+                conditions.append(f"{key} = %s")
+                params.append(value)
+        return conditions
+
     def filter(self, **kwargs):
         self.filters.update(kwargs)
         return self
@@ -198,52 +443,53 @@ class Manager:
     async def all(self):
         query = f"SELECT * FROM {self.model_class._table_name}"
         params = []
-        conditions = []
 
         if self.filters:
-            for key, value in self.filters.items():
-                conditions.append(f"{key} = %s")
-                params.append(value)
-            query += " WHERE " + " AND ".join(conditions)
+            query += " WHERE " + " AND ".join(self._conditions(params))
 
         if self.order_by_fields:
             query += " ORDER BY " + ", ".join(self.order_by_fields)
 
-        results = await self.db.fetch_all(query, tuple(params))
+        targets = await self._targets(self.filters)
+        if len(targets) == 1:
+            results = await targets[0].fetch_all(query, tuple(params))
+        else:
+            results = merge_ordered(
+                await asyncio.gather(*(target.fetch_all(query, tuple(params)) for target in targets)),
+                self.order_by_fields
+            )
         return [self.model_class(**row) for row in results]
 
     async def get(self, **kwargs):
         self.filters.update(kwargs)
         query = f"SELECT * FROM {self.model_class._table_name}"
         params = []
-        conditions = []
 
         if self.filters:
-            for key, value in self.filters.items():
-                conditions.append(f"{key} = %s")
-                params.append(value)
-            query += " WHERE " + " AND ".join(conditions)
+            query += " WHERE " + " AND ".join(self._conditions(params))
+
+        if self.order_by_fields:
+            query += " ORDER BY " + ", ".join(self.order_by_fields)
         
         query += " LIMIT 1"
 
-        result = await self.db.fetch_one(query, tuple(params))
+        targets = await self._targets(self.filters)
+        results = await asyncio.gather(*(target.fetch_one(query, tuple(params)) for target in targets))
+        result = next((row for row in results if row), None)
         return self.model_class(**result) if result else None
 
     async def exists(self) -> bool:
         # Optimized exists query
         query = f"SELECT 1 FROM {self.model_class._table_name}"
         params = []
-        conditions = []
 
         if self.filters:
-            for key, value in self.filters.items():
-                conditions.append(f"{key} = %s")
-                params.append(value)
-            query += " WHERE " + " AND ".join(conditions)
+            query += " WHERE " + " AND ".join(self._conditions(params))
         
         query += " LIMIT 1"
-        result = await self.db.fetch_one(query, tuple(params))
-        return bool(result)
+        targets = await self._targets(self.filters)
+        results = await asyncio.gather(*(target.fetch_one(query, tuple(params)) for target in targets))
+        return any(results)
 
     async def update(self, **kwargs):
         if not kwargs:
@@ -259,14 +505,12 @@ class Manager:
         
         query += ", ".join(set_clauses)
 
-        conditions = []
         if self.filters:
-            for key, value in self.filters.items():
-                conditions.append(f"{key} = %s")
-                params.append(value)
-            query += " WHERE " + " AND ".join(conditions)
+            query += " WHERE " + " AND ".join(self._conditions(params))
         
-        return await self.db.execute(query, tuple(params))
+        targets = await self._targets(self.filters)
+        results = await asyncio.gather(*(target.execute(query, tuple(params)) for target in targets))
+        return sum(results)
 
     async def create(self, **kwargs):
         keys = list(kwargs.keys())
@@ -275,21 +519,46 @@ class Manager:
         placeholders = ["%s"] * len(keys)
         query = f"INSERT INTO {self.model_class._table_name} ({', '.join(keys)}) VALUES ({', '.join(placeholders)})"
         
-        await self.db.execute(query, tuple(values))
+        targets = await self._targets(kwargs)
+        if len(targets) != 1:
+            raise ValueError(f"Cannot route insert into {self.model_class._table_name} to a single shard")
+
+        await targets[0].execute(query, tuple(values))
+        if self.db.shards and "ticket_id" in kwargs:
+            self.db.shards.remember(kwargs["ticket_id"], targets[0])
         return self.model_class(**kwargs)
 
+    async def bulk_create(self, rows: List[Dict[str, Any]]):
+        """Insert several rows with one multi-row ``INSERT``; the rows must share their columns and shard."""
+        if not rows:
+            return []
+        keys = list(rows[0].keys())
+        row_placeholders = f"({', '.join(['%s'] * len(keys))})"
+        query = (
+            f"INSERT INTO {self.model_class._table_name} ({', '.join(keys)}) "
+            f"VALUES {', '.join([row_placeholders] * len(rows))}"
+        )
+        params = tuple(row[key] for row in rows for key in keys)
+
+        targets = await self._targets(rows[0])
+        if len(targets) != 1:
+            raise ValueError(f"Cannot route insert into {self.model_class._table_name} to a single shard")
+
+        await targets[0].execute(query, params)
+        if self.db.shards and "ticket_id" in rows[0]:
+            self.db.shards.remember(rows[0]["ticket_id"], targets[0])
+        return [self.model_class(**row) for row in rows]
+
     async def delete(self):
         query = f"DELETE FROM {self.model_class._table_name}"
         params = []
-        conditions = []
 
         if self.filters:
-            for key, value in self.filters.items():
-                conditions.append(f"{key} = %s")
-                params.append(value)
-            query += " WHERE " + " AND ".join(conditions)
+            query += " WHERE " + " AND ".join(self._conditions(params))
         
-        return await self.db.execute(query, tuple(params))
+        targets = await self._targets(self.filters)
+        results = await asyncio.gather(*(target.execute(query, tuple(params)) for target in targets))
+        return sum(results)
 
 
 
@@ -297,6 +566,7 @@ class Model:
     db: Optional[BtAioMysql] = None
     _table_name: str = ""
     _primary_key: str = "id"
+    _shard_keys: Tuple[str, ...] = ()
 
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
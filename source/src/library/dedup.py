@@ -0,0 +1,152 @@
+import math
+import time
+import hashlib
+from loguru import logger
+from redis.exceptions import RedisError
+from typing import Dict, Iterable, List, Optional
+from telebot.types import Update
+
+from src.library.redis import BtRedis
+
+
+# Claim every member in the current time bucket (KEYS[2]) unless it is already in the
+# previous (KEYS[1]) or the next (KEYS[3]) one; the next bucket covers workers whose clock
+# runs a little ahead. Returns 1 per newly claimed member, 0 per member seen before.
+CLAIM_SCRIPT = """
+local claimed = {}
+for i = 2, #ARGV do
+    if redis.call('SISMEMBER', KEYS[1], ARGV[i]) == 1 or redis.call('SISMEMBER', KEYS[3], ARGV[i]) == 1 then
+        claimed[i - 1] = 0
+    else
+        claimed[i - 1] = redis.call('SADD', KEYS[2], ARGV[i])
+    end
+end
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[1]) * 2)
+return claimed
+"""
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings, sized for ``capacity`` items at ``error_rate`` false positives."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class UpdateDeduplicator:
+    """
+    Drops Telegram updates that were already processed, by this worker or any other.
+
+    An update is identified by its ``update_id`` and, for messages, by its
+    ``(chat_id, message_id)`` pair. Identifiers are claimed in time-bucketed Redis sets
+    holding at least ``ttl`` seconds of history, one script call per batch of updates.
+    Each worker also keeps two generations of bloom filters over what it processed,
+    rotated every ``ttl`` seconds or ``capacity`` identifiers. They only decide when
+    Redis cannot be reached, since a false positive would silently drop a real message.
+    """
+
+    def __init__(
+            self,
+            redis: BtRedis,
+            ttl: int = 3600,
+            capacity: int = 100000,
+            error_rate: float = 1e-7,
+            prefix: str = "bt:dedup"):
+        """Initialize the deduplicator.
+
+        Args:
+            redis: Redis wrapper holding the claimed identifiers
+            ttl: Seconds an identifier is remembered for at least
+            capacity: Identifiers per bloom filter generation, after which it is rotated
+            error_rate: Chance that a new update is taken for one this worker already processed
+            prefix: Prefix of the Redis keys
+        """
+        self.redis = redis
+        self.ttl = ttl
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.prefix = prefix
+        self.logger = logger
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous: Optional[BloomFilter] = None
+        self._rotated_at = time.monotonic()
+        self._inserted = 0
+        self._claim = None
+        self.counters: Dict[str, int] = {"processed": 0, "duplicates_local": 0, "duplicates": 0, "errors": 0}
+
+    @staticmethod
+    def _identifiers(update: Update) -> List[str]:
+        identifiers = [f"u:{update.update_id}"]
+        if update.message is not None:
+            identifiers.append(f"m:{update.message.chat.id}:{update.message.message_id}")
+        return identifiers
+
+    def _seen_locally(self, identifiers: List[str]) -> bool:
+        return any(
+            identifier in self._current or (self._previous is not None and identifier in self._previous)
+            for identifier in identifiers
+        )
+
+    def _remember(self, identifiers: List[str]) -> None:
+        if time.monotonic() - self._rotated_at >= self.ttl or self._inserted + len(identifiers) > self.capacity:
+            self._previous, self._current = self._current, BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = time.monotonic()
+            self._inserted = 0
+        for identifier in identifiers:
+            self._current.add(identifier)
+        self._inserted += len(identifiers)
+
+    def _bucket_keys(self) -> List[str]:
+        bucket = int(time.time() // self.ttl)
+        return [f"{self.prefix}:updates:{bucket + offset}" for offset in (-1, 0, 1)]
+
+    async def _claim_in_redis(self, members: List[str]) -> Optional[List[int]]:
+        if not self.redis.connected:
+            return None
+        if self._claim is None:
+            self._claim = self.redis.client.register_script(CLAIM_SCRIPT)
+        try:
+            return await self._claim(keys=self._bucket_keys(), args=[self.ttl, *members])
+        except (RedisError, OSError) as e:
+            self.counters["errors"] += 1
+            self.logger.warning(f"Update de-duplication in Redis failed, using this worker's history only: {e}")
+            return None
+
+    async def filter(self, updates: List[Update]) -> List[Update]:
+        """Return the updates not processed before, claiming them for this worker."""
+        candidates = [(update, self._identifiers(update)) for update in updates]
+        if not candidates:
+            return []
+        claimed = await self._claim_in_redis([identifier for _, identifiers in candidates for identifier in identifiers])
+
+        fresh = []
+        position = 0
+        for update, identifiers in candidates:
+            if claimed is not None:
+                results = claimed[position:position + len(identifiers)]
+                position += len(identifiers)
+                if not all(results):
+                    self.counters["duplicates"] += 1
+                    self.logger.debug(f"Skipping update {update.update_id}, already processed")
+                    continue
+            elif self._seen_locally(identifiers):
+                self.counters["duplicates_local"] += 1
+                continue
+            self._remember(identifiers)
+            fresh.append(update)
+        self.counters["processed"] += len(fresh)
+        return fresh
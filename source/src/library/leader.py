@@ -0,0 +1,155 @@
+import time
+import asyncio
+from uuid import uuid4
+from loguru import logger
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from src.library.redis import BtRedis
+
+
+# Extend or drop the lease only while it still holds our value
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderElection:
+    """
+    Elects one bot replica to run the periodic background jobs, using a Redis lease.
+
+    The lease is taken with ``SET NX PX`` and renewed every third of its duration by
+    the holder. Each term gets a fencing token from ``INCR``, stored in the lease value.
+    Jobs hand ``fence`` to the writes they guard, which compare it with the lease in the
+    same Redis script, so a replica that stalled past its lease cannot act on it.
+    A leader that cannot renew steps down locally before its lease can expire, and a
+    standby takes over within one lease plus one renewal interval after a leader dies.
+    """
+
+    def __init__(self, redis: BtRedis, name: str = "bt:leader", lease: float = 15.0):
+        """Initialize the election.
+
+        Args:
+            redis: Redis wrapper holding the lease
+            name: Key of the lease; the fencing counter lives at ``<name>:token``
+            lease: Lease duration in seconds
+        """
+        self.redis = redis
+        self.name = name
+        self.lease = lease
+        self.renew_interval = lease / 3
+        self.logger = logger
+        self.instance_id = uuid4().hex
+        self.token: Optional[int] = None
+        self._value: Optional[str] = None
+        self._valid_until: float = 0.0
+        self._jobs: List[Callable[[], Awaitable[None]]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def is_leader(self) -> bool:
+        return self._value is not None and time.monotonic() < self._valid_until
+
+    @property
+    def fence(self) -> Tuple[str, str]:
+        """``(lease key, lease value)`` of the current term, for writes checked against the lease.
+
+        The value is empty when not leader, which never matches a held lease.
+        """
+        return self.name, self._value or ""
+
+    def add_job(self, job: Callable[[], Awaitable[None]]) -> None:
+        """Run ``job()`` while this replica is the leader; it is cancelled on losing leadership."""
+        self._jobs.append(job)
+
+    async def _acquire(self) -> bool:
+        if await self.redis.client.exists(self.name):
+            # Held by another replica; don't burn a token on a SET that will fail
+            return False
+        token = await self.redis.client.incr(f"{self.name}:token")
+        value = f"{self.instance_id}:{token}"
+        started = time.monotonic()
+        if not await self.redis.client.set(self.name, value, nx=True, px=int(self.lease * 1000)):
+            return False
+        self.token, self._value = token, value
+        self._valid_until = started + self.lease
+        return True
+
+    async def _renew(self) -> bool:
+        started = time.monotonic()
+        renewed = await self.redis.client.eval(RENEW_SCRIPT, 1, self.name, self._value, int(self.lease * 1000))
+        if renewed:
+            self._valid_until = started + self.lease
+        return bool(renewed)
+
+    async def ensure(self) -> bool:
+        """
+        Check with Redis that this replica still holds the lease of its current term.
+
+        Only a cheap early exit; writes that must not happen after the lease is lost are
+        guarded with ``fence`` instead.
+        """
+        if not self.is_leader:
+            return False
+        try:
+            return await self.redis.client.get(self.name) == self._value
+        except Exception as e:
+            self.logger.warning(f"Failed to check leadership: {e}")
+            return False
+
+    async def run(self) -> None:
+        """Campaign for the lease and run the jobs while holding it; runs until cancelled."""
+        try:
+            while True:
+                try:
+                    if self._value is None:
+                        if await self._acquire():
+                            self.logger.info(f"Elected leader for {self.name} (token {self.token})")
+                            self._start_jobs()
+                    elif not await self._renew():
+                        self.logger.warning(f"Lost leadership of {self.name} (token {self.token})")
+                        await self._step_down()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"Leader election for {self.name} failed: {e}")
+
+                if self._value is not None and not self.is_leader:
+                    # Could not renew in time; someone else may hold the lease by now
+                    self.logger.warning(f"Lease of {self.name} ran out before it could be renewed")
+                    await self._step_down()
+                await asyncio.sleep(self.renew_interval)
+        finally:
+            await self.release()
+
+    def _start_jobs(self) -> None:
+        self._tasks = [asyncio.create_task(job()) for job in self._jobs]
+
+    async def _step_down(self) -> None:
+        self._value = None
+        self._valid_until = 0.0
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def release(self) -> None:
+        """Stop the jobs and hand the lease over immediately instead of letting it expire."""
+        value = self._value
+        await self._step_down()
+        if value is None or not self.redis.connected:
+            return
+        try:
+            await self.redis.client.eval(RELEASE_SCRIPT, 1, self.name, value)
+            self.logger.info(f"Released leadership of {self.name}")
+        except Exception as e:
+            self.logger.warning(f"Failed to release leadership of {self.name}: {e}")
@@ -0,0 +1,131 @@
+import asyncio
+from collections import deque
+from loguru import logger
+from typing import Deque, Dict, Optional
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to observed latency and errors (AIMD).
+
+    The limit grows by one after every window of fast completions while callers are
+    waiting for a slot, and is cut multiplicatively on errors or slow windows.
+    Callers over the limit wait in FIFO order.
+    """
+
+    def __init__(
+            self,
+            initial_limit: int = 10,
+            min_limit: int = 2,
+            max_limit: int = 50,
+            target_latency: float = 0.05,
+            tolerance: float = 2.0,
+            backoff: float = 0.5,
+            window: int = 20):
+        """Initialize the limiter.
+
+        Args:
+            initial_limit: Starting concurrency limit
+            min_limit: Lowest limit the backoff may reach
+            max_limit: Highest limit the increase may reach
+            target_latency: Average latency in seconds under which the limit may grow
+            tolerance: Multiple of target_latency above which the limit is cut
+            backoff: Factor applied to the limit on a cut
+            window: Number of completions averaged before adjusting
+        """
+        self.logger = logger
+        self.limit: float = float(max(min_limit, min(initial_limit, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window = window
+
+        self.in_flight: int = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._samples: int = 0
+        self._latency_sum: float = 0.0
+        self._saturated: bool = False
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """Wait for a slot under the current limit."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+
+        self._saturated = True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation
+                self.in_flight -= 1
+                self._wake()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    # _wake() already popped the cancelled waiter
+                    pass
+            raise
+
+    def release(self, latency: Optional[float], error: bool = False) -> None:
+        """Give the slot back and feed the outcome of the call into the limit.
+
+        A ``latency`` of None (nothing was measured) only counts when ``error`` is set.
+        """
+        self.in_flight -= 1
+        if latency is not None or error:
+            self._record(latency or 0.0, error)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _record(self, latency: float, error: bool) -> None:
+        if error:
+            self._adjust(self.limit * self.backoff, "error")
+            return
+
+        self._samples += 1
+        self._latency_sum += latency
+        if self._samples < self.window:
+            return
+
+        average = self._latency_sum / self._samples
+        if average > self.target_latency * self.tolerance:
+            self._adjust(self.limit * self.backoff, f"average latency {average * 1000:.1f}ms")
+        elif average <= self.target_latency and self._saturated:
+            self._adjust(self.limit + 1, f"average latency {average * 1000:.1f}ms")
+        else:
+            self._reset_window()
+
+    def _adjust(self, limit: float, reason: str) -> None:
+        previous = int(self.limit)
+        self.limit = max(float(self.min_limit), min(float(self.max_limit), limit))
+        self._reset_window()
+        if int(self.limit) != previous:
+            self.logger.info(f"Concurrency limit {previous} -> {int(self.limit)} ({reason})")
+
+    def _reset_window(self) -> None:
+        self._samples = 0
+        self._latency_sum = 0.0
+        self._saturated = bool(self._waiters)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": self.queued
+        }
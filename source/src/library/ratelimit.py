@@ -0,0 +1,101 @@
+import math
+import time
+from loguru import logger
+from redis.exceptions import RedisError
+from typing import Dict, Hashable
+
+from src.library.cache import TTLCache
+from src.library.redis import BtRedis
+
+
+class RateLimiter:
+    """
+    Token bucket per key (a user or a chat), shared by every worker through Redis.
+
+    Each key may send ``burst`` messages at once and ``rate`` per second after that.
+    Redis holds the authoritative bucket (``BtRedis.take_token``); in front of it every
+    worker keeps its own bucket with the same limits plus the time a throttled key is
+    blocked until, so a flood is turned away in-process without a Redis call per
+    message. If Redis fails the limiter falls back to the local bucket alone.
+    """
+
+    def __init__(self, redis: BtRedis, rate: float, burst: int, prefix: str, maxsize: int = 10000):
+        """Initialize the limiter.
+
+        Args:
+            redis: Redis wrapper holding the shared buckets
+            rate: Tokens per second, 0 or less disables the limiter
+            burst: Bucket capacity
+            prefix: Prefix of the Redis keys, e.g. ``bt:rl:user``
+            maxsize: Maximum number of keys tracked in-process
+        """
+        self.redis = redis
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self.logger = logger
+        refill = burst / rate if rate > 0 else None
+        # key -> (tokens, monotonic time of the last update); dropped once it would be full
+        self._buckets: TTLCache = TTLCache(maxsize=maxsize, ttl=refill)
+        self._blocked: TTLCache = TTLCache(maxsize=maxsize, ttl=None)
+        self._noticed: TTLCache = TTLCache(maxsize=maxsize, ttl=refill)
+        self.counters: Dict[str, int] = {"allowed": 0, "denied_local": 0, "denied": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _take_local(self, key: Hashable) -> bool:
+        now = time.monotonic()
+        tokens, updated = self._buckets.peek(key, (float(self.burst), now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets.set(key, (tokens, now))
+            return False
+        self._buckets.set(key, (tokens - 1, now))
+        return True
+
+    async def allow(self, key: Hashable) -> bool:
+        """Take one token for ``key``; False means the message should be dropped."""
+        if not self.enabled:
+            return True
+        if key in self._blocked or not self._take_local(key):
+            self.counters["denied_local"] += 1
+            return False
+
+        if self.redis.connected:
+            try:
+                allowed, wait = await self.redis.take_token(f"{self.prefix}:{key}", self.rate, self.burst)
+            except (RedisError, OSError) as e:
+                self.counters["errors"] += 1
+                self.logger.warning(f"Rate limit check for {self.prefix}:{key} failed, using the local bucket: {e}")
+                allowed, wait = True, 0.0
+            if not allowed:
+                self._blocked.set(key, True, ttl=wait)
+                self.counters["denied"] += 1
+                return False
+
+        self.counters["allowed"] += 1
+        return True
+
+    async def should_notify(self, key: Hashable) -> bool:
+        """
+        Whether to tell ``key`` it is being throttled.
+
+        At most one notice goes out per key each time its bucket could refill, across
+        all workers, so the notice itself cannot become a flood.
+        """
+        if key in self._noticed:
+            return False
+        refill = math.ceil(self.burst / self.rate)
+        self._noticed.set(key, True)
+        if not self.redis.connected:
+            return True
+        try:
+            return bool(await self.redis.client.set(f"{self.prefix}:notice:{key}", 1, nx=True, ex=refill))
+        except (RedisError, OSError) as e:
+            self.logger.warning(f"Throttle notice check for {self.prefix}:{key} failed: {e}")
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "tracked": len(self._buckets), "blocked": len(self._blocked)}
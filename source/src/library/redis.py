@@ -1,38 +1,342 @@
+import asyncio
 import redis.asyncio as redis
 from loguru import logger
+from collections import OrderedDict
+from redis.exceptions import RedisError
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, Type, TypeVar, Union
+
 from src.types.config import RedisConfig
+from src.library.codec import Codec, CodecError
+
+T = TypeVar("T")
+
+TRACKING_CHANNEL = b"__redis__:invalidate"
+
+# Refill by elapsed server time, then take ``cost`` tokens if there are enough.
+# Returns {allowed, seconds until enough tokens}; the bucket expires once it would be full.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+_ABSENT = object()
+
 
 class BtRedis:
     """
     Redis client wrapper for BotTicketing
     """
-    def __init__(self, config: RedisConfig):
+    def __init__(self, config: RedisConfig, codec: Optional[Codec] = None):
         self.config = config
         self._redis = None
+        self._raw = None
+        self.codec = codec or Codec()
         self.logger = logger
+        # Client-side cache of tracked keys, kept fresh by server-assisted invalidation
+        self._tracked: "OrderedDict[bytes, Optional[bytes]]" = OrderedDict()
+        self._tracking_task: Optional[asyncio.Task] = None
+        self._tracking_ready = False
+        self._tracking_generation = 0
+        self._tracking_counters: Dict[str, int] = {"hits": 0, "misses": 0, "fallbacks": 0, "invalidations": 0}
+        self._token_bucket = None
 
     async def connect(self):
         try:
-            self._redis = redis.Redis(
+            client = redis.Redis(
                 host=self.config.host,
                 port=self.config.port,
                 db=self.config.db,
                 password=self.config.password,
                 decode_responses=True
             )
-            await self._redis.ping()
+            await client.ping()
+            # Encoded values are binary, so they go through a client that leaves responses as bytes
+            self._raw = redis.Redis(
+                host=self.config.host,
+                port=self.config.port,
+                db=self.config.db,
+                password=self.config.password,
+                decode_responses=False
+            )
+            self._redis = client
             self.logger.info(f"Connected to Redis at {self.config.host}:{self.config.port}")
+            if self.config.client_tracking:
+                self._tracking_task = asyncio.create_task(self._track())
         except Exception as e:
             self.logger.error(f"Failed to connect to Redis: {e}")
             raise
 
     async def disconnect(self):
+        if self._tracking_task:
+            self._tracking_task.cancel()
+            await asyncio.gather(self._tracking_task, return_exceptions=True)
+            self._tracking_task = None
+            self.logger.info(f"Client-side cache stats: {self.tracking_stats()}")
         if self._redis:
             await self._redis.close()
+            await self._raw.close()
+            self._redis = None
+            self._raw = None
             self.logger.info("Disconnected from Redis")
 
+    @property
+    def connected(self) -> bool:
+        return self._redis is not None
+
     @property
     def client(self) -> redis.Redis:
         if not self._redis:
             raise ConnectionError("Redis client is not connected. Call connect() first.")
         return self._redis
+
+    @property
+    def raw(self) -> redis.Redis:
+        """Client returning responses as bytes, for values encoded with the codec."""
+        if not self._raw:
+            raise ConnectionError("Redis client is not connected. Call connect() first.")
+        return self._raw
+
+    async def get_object(self, key: str, expected: Optional[Type[T]] = None, default: Any = None) -> Optional[T]:
+        """
+        Read a value written by ``set_object``.
+
+        Args:
+            key: Redis key.
+            expected: Type the value must have; anything else is treated as missing.
+            default: Returned when the key is missing or cannot be decoded.
+        """
+        data = await self.raw.get(key)
+        if data is None:
+            return default
+        try:
+            value = self.codec.decode(data)
+        except CodecError as e:
+            # Typically a value written by a newer deploy; the caller reloads it
+            self.logger.debug(f"Ignoring undecodable value at {key}: {e}")
+            return default
+        if expected is not None and not isinstance(value, expected):
+            self.logger.debug(f"Ignoring value of type {type(value).__name__} at {key}, expected {expected.__name__}")
+            return default
+        return value
+
+    async def set_object(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> bool:
+        """Encode ``value`` with the codec and store it, optionally with an expiry in seconds."""
+        return bool(await self.raw.set(key, self.codec.encode(value), ex=ex, nx=nx))
+
+    async def take_token(self, key: str, rate: float, burst: int, cost: int = 1) -> Tuple[bool, float]:
+        """
+        Take tokens from the bucket at ``key`` atomically, shared by every client of this Redis.
+
+        Args:
+            key: Redis key of the bucket.
+            rate: Tokens added per second.
+            burst: Bucket capacity; a new bucket starts full.
+            cost: Tokens to take.
+
+        Returns:
+            Whether the tokens were taken, and otherwise the seconds until they would be.
+        """
+        if self._token_bucket is None:
+            self._token_bucket = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+        allowed, wait = await self._token_bucket(keys=[key], args=[rate, burst, cost])
+        return bool(allowed), float(wait)
+
+    async def _enable_expired_events(self) -> None:
+        """Make sure the server publishes expired-key events (``E`` and ``x`` in notify-keyspace-events)."""
+        try:
+            flags = (await self.client.config_get("notify-keyspace-events")).get("notify-keyspace-events", "")
+            wanted = flags
+            if "E" not in wanted:
+                wanted += "E"
+            if "x" not in wanted and "A" not in wanted:
+                wanted += "x"
+            if wanted != flags:
+                await self.client.config_set("notify-keyspace-events", wanted)
+                self.logger.info(f"Set notify-keyspace-events to '{wanted}'")
+        except RedisError as e:
+            # Managed Redis often disallows CONFIG; the setting then has to be made on the server
+            self.logger.warning(f"Could not enable expired-key events, make sure notify-keyspace-events includes 'Ex': {e}")
+
+    async def listen_expired(
+            self,
+            prefix: str,
+            callback: Callable[[str], Awaitable[None]],
+            on_subscribe: Optional[Callable[[], Awaitable[Any]]] = None,
+            max_pending: int = 100) -> None:
+        """
+        Call ``callback(key)`` for every expired key starting with ``prefix``; runs until cancelled.
+
+        Callbacks run as tasks so a slow one does not hold up later events. Reading pauses
+        only while ``max_pending`` callbacks are running; those still running when the
+        listener is cancelled are cancelled with it.
+
+        Args:
+            prefix: Key prefix to react to, e.g. ``ticket_session:``.
+            callback: Coroutine function called with each expired key.
+            on_subscribe: Coroutine function run after every (re)subscription, to catch up on
+                events missed while not subscribed; Redis does not replay them.
+            max_pending: Maximum number of callbacks running at once.
+        """
+        channel = f"__keyevent@{self.config.db}__:expired"
+        await self._enable_expired_events()
+        pending: Set[asyncio.Task] = set()
+
+        def done(task: asyncio.Task) -> None:
+            pending.discard(task)
+            if not task.cancelled() and task.exception():
+                self.logger.error(f"Expired-key callback failed: {task.exception()}")
+
+        try:
+            while True:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    await pubsub.subscribe(channel)
+                    self.logger.info(f"Listening for expired {prefix}* keys on {channel}")
+                    if on_subscribe:
+                        await on_subscribe()
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message" and message["data"].startswith(prefix):
+                            if len(pending) >= max_pending:
+                                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                            task = asyncio.create_task(callback(message["data"]))
+                            pending.add(task)
+                            task.add_done_callback(done)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"Expired-key listener failed, resubscribing: {e}")
+                    await asyncio.sleep(1)
+                finally:
+                    await pubsub.aclose()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get_cached(self, key: Union[str, bytes]) -> Optional[bytes]:
+        """
+        Read a raw value through the client-side cache.
+
+        Keys under the configured ``tracking_prefixes`` are answered locally until Redis
+        reports a change to them. Without tracking (disabled, unsupported by the server or
+        while the invalidation connection is down) this is a plain ``GET``.
+        """
+        cache_key = key.encode() if isinstance(key, str) else key
+        if not self._tracking_ready or not cache_key.startswith(self._tracking_prefixes):
+            self._tracking_counters["fallbacks"] += 1
+            return await self.raw.get(key)
+
+        value = self._tracked.get(cache_key, _ABSENT)
+        if value is not _ABSENT:
+            self._tracked.move_to_end(cache_key)
+            self._tracking_counters["hits"] += 1
+            return value
+
+        self._tracking_counters["misses"] += 1
+        generation = self._tracking_generation
+        value = await self.raw.get(key)
+        # An invalidation that arrived during the read may be for this key; don't keep a stale value
+        if self._tracking_ready and generation == self._tracking_generation:
+            self._tracked[cache_key] = value
+            while len(self._tracked) > self.config.tracking_maxsize:
+                self._tracked.popitem(last=False)
+        return value
+
+    def untrack(self, *keys: Union[str, bytes]) -> None:
+        """Drop keys (all of them when none are given) from the client-side cache after writing them."""
+        if not keys:
+            self._tracked.clear()
+        for key in keys:
+            self._tracked.pop(key.encode() if isinstance(key, str) else key, None)
+        self._tracking_generation += 1
+
+    def tracking_stats(self) -> Dict[str, Any]:
+        counters = self._tracking_counters
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "size": len(self._tracked),
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "active": self._tracking_ready,
+        }
+
+    @property
+    def _tracking_prefixes(self) -> tuple:
+        return tuple(prefix.encode() for prefix in self.config.tracking_prefixes) if self.config.client_tracking else ()
+
+    async def _track(self) -> None:
+        """
+        Keep a connection subscribed to tracking invalidations; runs until cancelled.
+
+        Tracking uses broadcast mode on the configured prefixes, redirected to this same
+        connection's ``__redis__:invalidate`` subscription, so one connection covers reads
+        made through any pooled connection. Whenever the connection is lost the local cache
+        is dropped and reads go to Redis until tracking is re-established.
+        """
+        while True:
+            connection = self.raw.connection_pool.make_connection()
+            try:
+                await connection.connect()
+                await connection.send_command("CLIENT", "ID")
+                client_id = await connection.read_response()
+                prefixes = [part for prefix in self.config.tracking_prefixes for part in ("PREFIX", prefix)]
+                await connection.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", *prefixes)
+                await connection.read_response()
+                await connection.send_command("SUBSCRIBE", TRACKING_CHANNEL)
+                await connection.read_response()
+
+                self._tracked.clear()
+                self._tracking_ready = True
+                self.logger.info(f"Client-side caching enabled for {', '.join(self.config.tracking_prefixes)}")
+                while True:
+                    message = await connection.read_response(timeout=30)
+                    if message is None:
+                        # Idle; make sure the connection is still alive
+                        await connection.send_command("PING")
+                        continue
+                    if message[0] == b"message" and message[1] == TRACKING_CHANNEL:
+                        self._invalidate_tracked(message[2])
+            except asyncio.CancelledError:
+                raise
+            except RedisError as e:
+                if "unknown" in str(e).lower() or "syntax" in str(e).lower():
+                    # CLIENT TRACKING needs Redis 6; keep reading through to the server
+                    self.logger.warning(f"Client-side caching is not supported by this Redis server: {e}")
+                    return
+                self.logger.warning(f"Client-side caching connection failed, retrying: {e}")
+                await asyncio.sleep(1)
+            except Exception as e:
+                self.logger.warning(f"Client-side caching connection failed, retrying: {e}")
+                await asyncio.sleep(1)
+            finally:
+                self._tracking_ready = False
+                self._tracked.clear()
+                await connection.disconnect()
+
+    def _invalidate_tracked(self, keys: Optional[list]) -> None:
+        self._tracking_generation += 1
+        self._tracking_counters["invalidations"] += 1
+        if keys is None:
+            # Sent on FLUSHALL/FLUSHDB
+            self._tracked.clear()
+            return
+        for key in keys:
+            self._tracked.pop(key, None)
@@ -0,0 +1,70 @@
+import time
+import asyncio
+from loguru import logger
+from typing import Any, Awaitable, Callable, Iterable, Tuple
+from telebot.asyncio_helper import ApiTelegramException
+
+
+class RateLimitedSender:
+    """
+    Sends many Telegram messages concurrently without exceeding a global rate.
+
+    Sends are spaced ``1 / rate`` seconds apart and at most ``concurrency`` run at once.
+    A 429 reply pauses the sender for the ``retry_after`` Telegram asks for before the
+    send is retried; other API errors (e.g. a user who blocked the bot) are logged and
+    counted as failures.
+    """
+
+    def __init__(self, rate: float = 25.0, concurrency: int = 8, retries: int = 3):
+        """Initialize the sender.
+
+        Args:
+            rate: Maximum messages per second across all concurrent sends
+            concurrency: Maximum number of sends in flight
+            retries: Attempts per message after a rate-limit reply
+        """
+        self.logger = logger
+        self.interval = 1.0 / rate
+        self.retries = retries
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._next_slot: float = 0.0
+
+    async def _wait_for_slot(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def send(self, send: Callable[[], Awaitable[Any]]) -> bool:
+        """Run one send under the rate and concurrency limits; returns whether it succeeded."""
+        async with self._semaphore:
+            for attempt in range(1, self.retries + 1):
+                await self._wait_for_slot()
+                try:
+                    await send()
+                    return True
+                except ApiTelegramException as e:
+                    if e.error_code == 429 and attempt < self.retries:
+                        retry_after = (e.result_json.get("parameters") or {}).get("retry_after", 1)
+                        self.logger.warning(f"Rate limited by Telegram, pausing sends for {retry_after}s")
+                        # Hold back every send, not just this one
+                        self._next_slot = max(self._next_slot, time.monotonic() + retry_after)
+                        continue
+                    self.logger.warning(f"Failed to send message: {e}")
+                    return False
+                except Exception as e:
+                    self.logger.warning(f"Failed to send message: {e}")
+                    return False
+            return False
+
+    async def send_all(self, sends: Iterable[Callable[[], Awaitable[Any]]]) -> Tuple[int, int]:
+        """
+        Run every send concurrently under the limits.
+
+        Returns:
+            Number of messages sent and number that failed.
+        """
+        results = await asyncio.gather(*(self.send(send) for send in sends))
+        sent = sum(results)
+        return sent, len(results) - sent
@@ -0,0 +1,174 @@
+import asyncio
+from collections import OrderedDict
+from loguru import logger
+from typing import Optional, Dict, Any, List, Tuple
+
+from src.library.database import BtAioMysql, merge_ordered
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash: map ``key`` to one of ``buckets`` buckets.
+
+    Growing the number of buckets from N to N+1 only moves about 1/(N+1) of the keys,
+    which keeps resharding cheap when a database is appended to the shard list.
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+class ShardRouter:
+    """Routes ticket data to one of several MySQL databases by the ticket owner's user ID."""
+
+    def __init__(self, shards: List[BtAioMysql], locator_size: int = 10000):
+        """Initialize the shard router.
+
+        Args:
+            shards: One connection manager per shard, in configuration order
+            locator_size: Maximum number of remembered ticket locations
+        """
+        self.shards = shards
+        self.logger = logger
+        self.locator_size = locator_size
+        self._locations: "OrderedDict[str, int]" = OrderedDict()
+
+    def index_for(self, user_id: int) -> int:
+        return jump_hash(int(user_id), len(self.shards))
+
+    def shard_for(self, user_id: int) -> BtAioMysql:
+        return self.shards[self.index_for(user_id)]
+
+    def remember(self, ticket_id: str, shard: BtAioMysql) -> None:
+        """Record which shard holds a ticket so later lookups by ticket ID skip the fan-out."""
+        self._locations[ticket_id] = self.shards.index(shard)
+        self._locations.move_to_end(ticket_id)
+        while len(self._locations) > self.locator_size:
+            self._locations.popitem(last=False)
+
+    async def locate_ticket(self, ticket_id: str) -> Optional[BtAioMysql]:
+        """Find the shard holding a ticket, asking every shard concurrently on a miss."""
+        index = self._locations.get(ticket_id)
+        if index is not None:
+            self._locations.move_to_end(ticket_id)
+            return self.shards[index]
+
+        rows = await self.fan_out("fetch_one", "SELECT user_id FROM tickets WHERE ticket_id = %s LIMIT 1", (ticket_id,))
+        for shard, row in zip(self.shards, rows):
+            if row:
+                self.remember(ticket_id, shard)
+                return shard
+        return None
+
+    async def route(self, keys: Tuple[str, ...], values: Dict[str, Any]) -> Optional[BtAioMysql]:
+        """
+        Pick the shard for a query from its filter values.
+
+        Args:
+            keys: Shard key columns of the model, in order of preference.
+            values: Column values of the query (filters or inserted row).
+
+        Returns:
+            The shard holding the rows, or None when the query has to fan out.
+        """
+        for key in keys:
+            value = values.get(key)
+            if value is None or isinstance(value, (list, tuple, set)):
+                continue
+            if key == "user_id":
+                return self.shard_for(value)
+            if key == "ticket_id":
+                shard = await self.locate_ticket(value)
+                if shard:
+                    return shard
+        return None
+
+    async def fan_out(self, method: str, query: str, params: Tuple = ()) -> List[Any]:
+        """Run the same query on every shard concurrently and return the per-shard results."""
+        return await asyncio.gather(*(getattr(shard, method)(query, params) for shard in self.shards))
+
+    async def fetch_all_ordered(self, query: str, params: Tuple = (), order_by: List[str] = None) -> List[Dict[str, Any]]:
+        """Run a cross-shard query and merge the ordered per-shard results."""
+        return merge_ordered(await self.fan_out("fetch_all", query, params), order_by or [])
+
+    async def create_tables(self, table_definitions: List[str]) -> None:
+        await asyncio.gather(*(shard.create_tables(table_definitions) for shard in self.shards))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(shard.close() for shard in self.shards))
+
+    async def rebalance(self, batch_size: int = 100, dry_run: bool = False, legacy: Optional[BtAioMysql] = None) -> int:
+        """
+        Move every user whose tickets live on the wrong shard to their home shard.
+
+        Run this with the bot stopped after appending a shard to the configuration.
+
+        Args:
+            batch_size: Number of users moved per transaction.
+            dry_run: Only count the users that would be moved.
+            legacy: Unsharded database whose ticket data should be moved onto the shards.
+
+        Returns:
+            Number of users moved (or to be moved on a dry run).
+        """
+        sources = [(index, shard) for index, shard in enumerate(self.shards)]
+        if legacy:
+            sources.insert(0, (None, legacy))
+
+        moved = 0
+        for index, source in sources:
+            rows = await source.fetch_all("SELECT DISTINCT user_id FROM tickets")
+            misplaced = [row["user_id"] for row in rows if self.index_for(row["user_id"]) != index]
+            self.logger.info(f"{len(misplaced)} users to move off {source.database.host}/{source.database.database}")
+
+            for start in range(0, len(misplaced), batch_size):
+                batch = misplaced[start:start + batch_size]
+                if not dry_run:
+                    await self._move_users(source, batch)
+                moved += len(batch)
+                self.logger.info(f"Moved {moved} users so far")
+        return moved
+
+    async def _move_users(self, source: BtAioMysql, user_ids: List[int]) -> None:
+        """Copy the tickets and messages of ``user_ids`` to their home shards, then delete them from ``source``."""
+        targets: Dict[int, List[int]] = {}
+        for user_id in user_ids:
+            targets.setdefault(self.index_for(user_id), []).append(user_id)
+
+        for index, batch in targets.items():
+            placeholders = ", ".join(["%s"] * len(batch))
+            tickets = await source.fetch_all(f"SELECT * FROM tickets WHERE user_id IN ({placeholders})", tuple(batch))
+            if not tickets:
+                continue
+            ticket_ids = tuple(ticket["ticket_id"] for ticket in tickets)
+            ticket_placeholders = ", ".join(["%s"] * len(ticket_ids))
+            messages = await source.fetch_all(
+                f"SELECT * FROM ticket_messages WHERE ticket_id IN ({ticket_placeholders}) ORDER BY id ASC", ticket_ids
+            )
+
+            # Copy first and make re-runs idempotent by replacing any partial copy on the target
+            async with self.shards[index].transaction() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(f"DELETE FROM ticket_messages WHERE ticket_id IN ({ticket_placeholders})", ticket_ids)
+                    await self._insert_rows(cursor, "tickets", tickets, ignore=True)
+                    await self._insert_rows(cursor, "ticket_messages", [
+                        {key: value for key, value in message.items() if key != "id"} for message in messages
+                    ])
+
+            await source.execute(f"DELETE FROM tickets WHERE user_id IN ({placeholders})", tuple(batch))
+            for ticket_id in ticket_ids:
+                self._locations.pop(ticket_id, None)
+
+    @staticmethod
+    async def _insert_rows(cursor, table: str, rows: List[Dict[str, Any]], ignore: bool = False) -> None:
+        if not rows:
+            return
+        columns = list(rows[0].keys())
+        query = (
+            f"INSERT {'IGNORE ' if ignore else ''}INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})"
+        )
+        await cursor.executemany(query, [tuple(row[column] for column in columns) for row in rows])
@@ -0,0 +1,199 @@
+from loguru import logger
+from redis.exceptions import WatchError
+from typing import Any, Dict, Optional
+from telebot.asyncio_storage import StateDataContext, StateStorageBase
+
+from src.library.redis import BtRedis
+
+
+STATE_FIELD = b"state"
+DATA_PREFIX = b"d:"
+
+# Data only belongs to a conversation that has a state, as with telebot's own storages
+SET_DATA_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+if tonumber(ARGV[3]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+
+class BtRedisStateStorage(StateStorageBase):
+    """
+    Telegram conversation state kept in Redis, shared by every bot worker.
+
+    Each chat/user pair is one hash holding the state name and one field per data key,
+    encoded with the ``BtRedis`` codec. Single data keys are written by one script call,
+    whole-data writes replace the fields in a ``MULTI`` guarded by ``WATCH``, and every
+    write refreshes the hash's TTL so abandoned conversations clean themselves up.
+    """
+
+    def __init__(self, redis: BtRedis, ttl: Optional[int] = 86400, prefix: str = "bt:state", separator: str = ":"):
+        """Initialize the storage.
+
+        Args:
+            redis: Connected (or later connected) Redis wrapper
+            ttl: Seconds a conversation is kept after its last write, None to keep it forever
+            prefix: Prefix of the state keys
+            separator: Separator between the key parts
+        """
+        super().__init__()
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+        self.separator = separator
+        self.logger = logger
+
+    def _state_key(
+            self,
+            chat_id: int,
+            user_id: int,
+            business_connection_id: Optional[str] = None,
+            message_thread_id: Optional[int] = None,
+            bot_id: Optional[int] = None) -> str:
+        return self._get_key(
+            chat_id, user_id, self.prefix, self.separator, business_connection_id, message_thread_id, bot_id
+        )
+
+    def _expire(self, pipe, key: str) -> None:
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+
+    def _encode_data(self, data: Dict[str, Any]) -> Dict[bytes, bytes]:
+        return {DATA_PREFIX + str(key).encode(): self.redis.codec.encode(value) for key, value in data.items()}
+
+    def _decode_data(self, fields: Dict[bytes, bytes]) -> Dict[str, Any]:
+        return {
+            field[len(DATA_PREFIX):].decode(): self.redis.codec.decode(value)
+            for field, value in fields.items() if field.startswith(DATA_PREFIX)
+        }
+
+    async def set_state(
+            self,
+            chat_id: int,
+            user_id: int,
+            state: Any,
+            business_connection_id: Optional[str] = None,
+            message_thread_id: Optional[int] = None,
+            bot_id: Optional[int] = None) -> bool:
+        if hasattr(state, "name"):
+            state = state.name
+        key = self._state_key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        async with self.redis.raw.pipeline(transaction=True) as pipe:
+            pipe.hset(key, STATE_FIELD, state)
+            self._expire(pipe, key)
+            await pipe.execute()
+        return True
+
+    async def get_state(
+            self,
+            chat_id: int,
+            user_id: int,
+            business_connection_id: Optional[str] = None,
+            message_thread_id: Optional[int] = None,
+            bot_id: Optional[int] = None) -> Optional[str]:
+        key = self._state_key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        state = await self.redis.raw.hget(key, STATE_FIELD)
+        return state.decode() if state else None
+
+    async def delete_state(
+            self,
+            chat_id: int,
+            user_id: int,
+            business_connection_id: Optional[str] = None,
+            message_thread_id: Optional[int] = None,
+            bot_id: Optional[int] = None) -> bool:
+        key = self._state_key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return await self.redis.raw.delete(key) > 0
+
+    async def set_data(
+            self,
+            chat_id: int,
+            user_id: int,
+            key: str,
+            value: Any,
+            business_connection_id: Optional[str] = None,
+            message_thread_id: Optional[int] = None,
+            bot_id: Optional[int] = None) -> bool:
+        state_key = self._state_key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        (field, encoded), = self._encode_data({key: value}).items()
+        if not await self.redis.raw.eval(SET_DATA_SCRIPT, 1, state_key, field, encoded, self.ttl or 0):
+            raise RuntimeError(f"BtRedisStateStorage: key {state_key} does not exist.")
+        return True
+
+    async def get_data(
+            self,
+            chat_id: int,
+            user_id: int,
+            business_connection_id: Optional[str] = None,
+            message_thread_id: Optional[int] = None,
+            bot_id: Optional[int] = None) -> Dict[str, Any]:
+        key = self._state_key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return self._decode_data(await self.redis.raw.hgetall(key))
+
+    async def _replace_data(self, key: str, data: Dict[str, Any]) -> bool:
+        """Swap every data field of an existing conversation for ``data``, keeping its state."""
+        fields = self._encode_data(data)
+        async with self.redis.raw.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    current = await pipe.hkeys(key)
+                    if not current:
+                        return False
+                    stale = [field for field in current if field.startswith(DATA_PREFIX) and field not in fields]
+                    pipe.multi()
+                    if stale:
+                        pipe.hdel(key, *stale)
+                    if fields:
+                        pipe.hset(key, mapping=fields)
+                    self._expire(pipe, key)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    self.logger.debug(f"State {key} changed while saving, retrying")
+                    continue
+
+    async def reset_data(
+            self,
+            chat_id: int,
+            user_id: int,
+            business_connection_id: Optional[str] = None,
+            message_thread_id: Optional[int] = None,
+            bot_id: Optional[int] = None) -> bool:
+        key = self._state_key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return await self._replace_data(key, {})
+
+    def get_interactive_data(
+            self,
+            chat_id: int,
+            user_id: int,
+            business_connection_id: Optional[str] = None,
+            message_thread_id: Optional[int] = None,
+            bot_id: Optional[int] = None) -> StateDataContext:
+        return StateDataContext(
+            self,
+            chat_id=chat_id,
+            user_id=user_id,
+            business_connection_id=business_connection_id,
+            message_thread_id=message_thread_id,
+            bot_id=bot_id,
+        )
+
+    async def save(
+            self,
+            chat_id: int,
+            user_id: int,
+            data: Dict[str, Any],
+            business_connection_id: Optional[str] = None,
+            message_thread_id: Optional[int] = None,
+            bot_id: Optional[int] = None) -> bool:
+        key = self._state_key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return await self._replace_data(key, data)
+
+    def __str__(self) -> str:
+        return f"BtRedisStateStorage({self.redis.config.host}:{self.redis.config.port}, prefix={self.prefix})"
@@ -0,0 +1,123 @@
+import hmac
+import asyncio
+from aiohttp import web
+from loguru import logger
+from typing import List, Optional
+from telebot.types import Update
+from telebot.async_telebot import AsyncTeleBot
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Receives Telegram updates over a webhook and feeds them to the bot.
+
+    Requests are checked against the webhook's secret token and acknowledged as soon
+    as the update is queued; handlers run afterwards on ``workers`` worker tasks.
+    Updates of one chat always go to the same worker, so they are handled in the
+    order Telegram sent them. When the queue of a worker is full the request is
+    answered with 503 and Telegram delivers the update again later.
+    """
+
+    def __init__(
+            self,
+            bot: AsyncTeleBot,
+            secret_token: str,
+            host: str = "0.0.0.0",
+            port: int = 8443,
+            path: str = "/telegram/webhook",
+            queue_size: int = 1000,
+            workers: int = 4):
+        """Initialize the server.
+
+        Args:
+            bot: Bot whose ``process_new_updates`` handles the updates
+            secret_token: Secret token given to ``set_webhook``
+            host: Interface to listen on
+            port: Port to listen on
+            path: URL path Telegram posts updates to
+            queue_size: Updates waiting to be handled, across all workers
+            workers: Number of worker tasks handling updates
+        """
+        self.bot = bot
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.path = path
+        self.logger = logger
+        self._queues: List[asyncio.Queue] = [
+            asyncio.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)
+        ]
+        self._workers: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    @staticmethod
+    def _chat_key(update: Update) -> int:
+        """Chat an update belongs to, so button presses queue behind the messages of their chat."""
+        for message in (update.message, update.edited_message, update.channel_post, update.edited_channel_post):
+            if message is not None:
+                return message.chat.id
+        if update.callback_query is not None:
+            if update.callback_query.message is not None:
+                return update.callback_query.message.chat.id
+            return update.callback_query.from_user.id
+        for member in (update.my_chat_member, update.chat_member):
+            if member is not None:
+                return member.chat.id
+        return update.update_id
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret_token):
+            self.logger.warning(f"Rejected webhook request from {request.remote} with a wrong secret token")
+            return web.Response(status=401)
+
+        try:
+            update = Update.de_json(await request.json())
+        except Exception as e:
+            self.logger.warning(f"Rejected malformed webhook update: {e}")
+            return web.Response(status=400)
+
+        queue = self._queues[hash(self._chat_key(update)) % len(self._queues)]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.logger.warning(f"Update queue is full, asking Telegram to redeliver update {update.update_id}")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self.bot.process_new_updates([update])
+            except Exception as e:
+                self.logger.error(f"Error processing update {update.update_id}: {e}")
+            finally:
+                queue.task_done()
+
+    async def start(self) -> None:
+        self._workers = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.logger.info(f"Webhook server listening on {self.host}:{self.port}{self.path} with {len(self._workers)} workers")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting updates, then give the queued ones up to ``timeout`` seconds to finish."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout=timeout)
+        except asyncio.TimeoutError:
+            pending = sum(queue.qsize() for queue in self._queues)
+            self.logger.warning(f"Stopped the webhook server with {pending} updates unprocessed")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
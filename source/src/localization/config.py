@@ -6,7 +6,11 @@ _main_config = get_config_yaml()
 
 _bot_config = BotConfig(**_main_config.get("bot", {}))
 _telegram_config = TelegramConfig(**_main_config.get("telegram", {}))
-_database_config = DatabaseConfig(**_main_config.get("database", {}))
+_database = _main_config.get("database", {})
+_database_config = DatabaseConfig(**{
+    **_database,
+    "shards": [DatabaseConfig(**shard) for shard in _database.get("shards") or []]
+})
 _redis_config = RedisConfig(**_main_config.get("redis", {}))
 
 
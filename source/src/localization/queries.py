@@ -81,6 +81,47 @@ CREATE TABLE IF NOT EXISTS ticket_messages (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 """
 
+# Ticket tables on a shard. Users live on the primary database, so the
+# foreign keys to `users` cannot be enforced across instances.
+CREATE_TABLE_TICKETS_SHARD: str = """
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_id VARCHAR(64) PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    message_id BIGINT NOT NULL,
+    message_chat_id BIGINT NOT NULL,
+    username VARCHAR(255) NOT NULL,
+    userfullname VARCHAR(500) NOT NULL,
+    issue TEXT NOT NULL,
+    status ENUM('open', 'closed', 'in_progress') DEFAULT 'open',
+    handler_id BIGINT NULL,
+    handler_username VARCHAR(255) NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    closed_at DATETIME NULL,
+    INDEX idx_user_id (user_id),
+    INDEX idx_handler_id (handler_id),
+    INDEX idx_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+"""
+
+CREATE_TABLE_TICKET_MESSAGES_SHARD: str = """
+CREATE TABLE IF NOT EXISTS ticket_messages (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    ticket_id VARCHAR(64) NOT NULL,
+    user_id BIGINT NOT NULL,
+    message_id BIGINT NOT NULL,
+    message_chat_id BIGINT NOT NULL,
+    username VARCHAR(255) NOT NULL,
+    userfullname VARCHAR(500) NOT NULL,
+    message TEXT NOT NULL,
+    message_from ENUM('admin', 'user', 'handler') DEFAULT 'user',
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (ticket_id) REFERENCES tickets(ticket_id) ON DELETE CASCADE,
+    INDEX idx_ticket_id (ticket_id),
+    INDEX idx_user_id (user_id),
+    INDEX idx_timestamp (timestamp)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+"""
+
 CREATE_TABLE_BANNED_USERS: str = """
 CREATE TABLE IF NOT EXISTS banned_users (
     user_id BIGINT PRIMARY KEY,
@@ -151,11 +192,12 @@ SELECT COUNT(*) AS count FROM tickets
 WHERE ticket_id = %s AND user_id = %s
 """
 
-GET_ALL_TICKET_MESSAGES: str = """
-SELECT username, userfullname, message, timestamp 
+# Messages of a ticket added after the message with the given ID, in insertion order
+GET_TICKET_MESSAGES_SINCE: str = """
+SELECT id, username, userfullname, message, timestamp 
 FROM ticket_messages
-WHERE ticket_id = %s 
-ORDER BY timestamp ASC
+WHERE ticket_id = %s AND id > %s
+ORDER BY id ASC
 """
 
 CLOSED_TICKET: str = """
@@ -209,3 +251,40 @@ ORDER BY created_at DESC
 GET_USER_BY_USERNAME: str = """
 SELECT id FROM users WHERE username = %s
 """
+
+GET_STAFF_USERS: str = """
+SELECT id, username, role_id FROM users WHERE role_id IN (2, 3)
+"""
+
+# Open tickets among the given IDs, locked until the closing transaction ends
+LOCK_OPEN_TICKETS: str = """
+SELECT * FROM tickets 
+WHERE ticket_id IN ({placeholders}) AND status = 'open' 
+FOR UPDATE
+"""
+
+CLOSE_TICKETS: str = """
+UPDATE tickets 
+SET status = 'closed', handler_id = %s, handler_username = %s, closed_at = %s 
+WHERE ticket_id IN ({placeholders}) AND status = 'open'
+"""
+
+GET_USERS_BY_IDS: str = """
+SELECT id, username, role_id FROM users WHERE id IN ({placeholders})
+"""
+
+GET_OPEN_TICKET_OWNERS: str = """
+SELECT ticket_id, user_id 
+FROM tickets 
+WHERE status = 'open'
+ORDER BY created_at ASC
+"""
+
+GET_RECENT_TICKET_USERS: str = """
+SELECT user_id, MAX(timestamp) AS last_seen 
+FROM ticket_messages 
+WHERE timestamp >= NOW() - INTERVAL %s DAY
+GROUP BY user_id
+ORDER BY last_seen DESC
+LIMIT %s
+"""
@@ -1,12 +1,74 @@
+from string import Formatter
+from typing import Any, Dict, Optional
+
 from src.types.template import MessagesTemplate, Template
 from src.utility.utility import get_config_yaml, arson
 
 
-def template(lang):
+_formatter = Formatter()
+
+
+class CompiledTemplate(str):
+    """
+    Message template parsed once at load time.
+
+    Placeholders are validated when the template is loaded and rendering walks the
+    parsed segments instead of re-parsing the template on every call. Templates whose
+    placeholders are all covered by the load-time defaults (e.g. ``bot_name``) are
+    rendered only once. Being a ``str``, it can still be used anywhere a raw template
+    string is expected.
+    """
+
+    def __new__(cls, text: str, name: str = "", defaults: Optional[Dict[str, Any]] = None):
+        compiled = super().__new__(cls, text)
+        compiled.name = name
+        compiled._parsed = compiled._parse()
+        compiled.fields = frozenset(field for _, field, _, _ in compiled._parsed if field is not None)
+        compiled.defaults = {key: value for key, value in (defaults or {}).items() if key in compiled.fields}
+        # Nested specs such as {amount:{width}} need str.format to expand them
+        compiled._nested = any(spec and "{" in spec for _, _, spec, _ in compiled._parsed)
+        compiled.static = compiled._format() if compiled.fields <= compiled.defaults.keys() else None
+        return compiled
+
+    def _parse(self):
+        try:
+            parsed = list(_formatter.parse(self))
+        except ValueError as e:
+            raise ValueError(f"Template '{self.name}' is malformed: {e}") from e
+
+        for _, field, _, conversion in parsed:
+            if field is not None and not field.isidentifier():
+                raise ValueError(f"Template '{self.name}' has an invalid placeholder '{{{field}}}'")
+            if conversion not in (None, "r", "s", "a"):
+                raise ValueError(f"Template '{self.name}' has an invalid conversion '!{conversion}'")
+        return parsed
+
+    def _format(self, **kwargs) -> str:
+        values = {**self.defaults, **kwargs}
+        if self._nested:
+            return str.format_map(self, values)
+        parts = []
+        for literal, field, format_spec, conversion in self._parsed:
+            parts.append(literal)
+            if field is not None:
+                value = _formatter.convert_field(values[field], conversion)
+                parts.append(format(value, format_spec))
+        return "".join(parts)
+
+    def render(self, **kwargs) -> str:
+        if self.static is not None and (not kwargs or kwargs == self.defaults or not self.fields):
+            return self.static
+        return self._format(**kwargs)
+
+
+def template(lang, **defaults):
     _main_template = get_config_yaml("src/templates/template-{}.yml".format(lang))
 
-    _message_template = MessagesTemplate(**_main_template.get("messages", {}))
+    _message_template = MessagesTemplate(**{
+        name: CompiledTemplate(text, name, defaults)
+        for name, text in _main_template.get("messages", {}).items()
+    })
 
     return Template(**arson(
         messages=_message_template
-    ))
\ No newline at end of file
+    ))
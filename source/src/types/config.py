@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Dict, Any, List, Optional
 
@@ -7,6 +7,7 @@ from typing import Dict, Any, List, Optional
 class BotConfig:
     name: str
     lang: str
+    warmup_timeout: float = 10.0
 
 @dataclass
 class TelegramConfig:
@@ -14,6 +15,21 @@ class TelegramConfig:
     chat_id: int
     bot_id: int
     admin_ids: List[int]
+    broadcast_rate: float = 25.0
+    state_storage: str = "memory"
+    state_ttl: int = 86400
+    album_settle: float = 1.0
+    user_rate_limit: float = 1.0
+    user_burst: int = 20
+    dedup_ttl: int = 3600
+    mode: str = "polling"
+    webhook_url: Optional[str] = None
+    webhook_secret: Optional[str] = None
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8443
+    webhook_path: str = "/telegram/webhook"
+    webhook_queue_size: int = 1000
+    webhook_workers: int = 4
 
 @dataclass
 class DatabaseConfig:
@@ -22,6 +38,7 @@ class DatabaseConfig:
     user: str
     password: str
     database: str
+    shards: List["DatabaseConfig"] = field(default_factory=list)
 
 @dataclass
 class RedisConfig:
@@ -30,6 +47,15 @@ class RedisConfig:
     db: int
     password: Optional[str]
     session_ttl: int
+    session_refresh_fraction: float = 0.95
+    cache_channel: str = "bt:cache:invalidate"
+    cache_ttls: Dict[str, int] = field(default_factory=dict)
+    expiry_notifications: bool = False
+    reconcile_interval: int = 3600
+    leader_lease: float = 15.0
+    client_tracking: bool = False
+    tracking_prefixes: List[str] = field(default_factory=lambda: ["bt:cache:"])
+    tracking_maxsize: int = 10000
 
 @dataclass
 class Config:
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Dict, Any, List, Optional, Literal
+from typing import Dict, Any, Callable, List, Optional, Literal
 from telebot.types import Message
 from telebot.types import (
     InputMedia, 
@@ -13,11 +13,34 @@ from enum import Enum
 
 
 @dataclass
-class MessagesStore:
+class Album:
+    media_group_id: str
     messages: List[Message]
-    processed: bool = False
+    medias: List[InputMedia|InputMediaAnimation|InputMediaAudio|InputMediaDocument|InputMediaPhoto|InputMediaVideo]
 
 
 @dataclass
-class MediaStores:
-    medias: List[InputMedia|InputMediaAnimation|InputMediaAudio|InputMediaDocument|InputMediaPhoto|InputMediaVideo]
\ No newline at end of file
+class RoleEntry:
+    role_id: int
+    user_id: Optional[int]
+    username: Optional[str]
+
+
+@dataclass
+class Transcript:
+    text: str = ""
+    count: int = 0
+    last_id: int = 0  # ID of the last ticket message folded into ``text``
+    pending: List[Any] = field(default_factory=list)
+
+
+@dataclass
+class CacheNamespace:
+    name: str
+    ttl: Optional[float]
+    negative_ttl: Optional[float] = None
+    local_ttl: Optional[float] = None
+    maxsize: int = 4096
+    shared: bool = True
+    encode: Optional[Callable[[Any], bytes]] = None
+    decode: Optional[Callable[[bytes], Any]] = None
@@ -49,6 +49,7 @@ class Ticket(Model):
     """Support ticket model"""
     _table_name = "tickets"
     _primary_key = "ticket_id"
+    _shard_keys = ("user_id", "ticket_id")
     
     ticket_id: str
     user_id: int
@@ -86,7 +87,7 @@ class Ticket(Model):
         self.status = "closed"
         self.handler_id = handler_id
         self.handler_username = handler_username
-        self.closed_at = datetime.now()
+        self.closed_at = datetime.now().replace(microsecond=0)
         
         await self.__class__.objects.filter(ticket_id=self.ticket_id).update(
             status=self.status,
@@ -100,6 +101,7 @@ class TicketMessage(Model):
     """Message associated with a ticket"""
     _table_name = "ticket_messages"
     _primary_key = "id"
+    _shard_keys = ("ticket_id",)
     
     id: int
     ticket_id: str
@@ -29,6 +29,7 @@ class MessagesTemplate:
     template_user_not_handler: str
     template_not_reply_bot: str
     template_reply_closed_ticket: str
+    template_auto_closed_ticket: str
     template_time_range_history: str
     template_empty_history: str
     template_history: str
@@ -45,6 +46,7 @@ class MessagesTemplate:
     template_handlers_content: str
     template_empty_handlers: str
     template_unauthorized_user: str
+    template_rate_limited: str
     template_regist_success: str
     
 @dataclass
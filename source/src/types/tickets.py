@@ -1,6 +1,9 @@
 from dataclasses import dataclass
 from typing import Optional
 
+from src.types.models import Ticket
+from src.types.data_store import Transcript
+
 
 @dataclass
 class UserDetails:
@@ -15,3 +18,10 @@ class MessageFrom:
     admin: str = "admin"
     handler: str = "handler"
     user: str = "user"
+
+
+@dataclass
+class TicketContext:
+    closed_ticket: Optional[Ticket] = None
+    owner_id: Optional[int] = None
+    transcript: Optional[Transcript] = None
@@ -4,7 +4,7 @@ import time
 import pytz
 import hashlib
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Tuple, Union
 
 
 def get_config_yaml(config_path: str = "config.yml") -> Dict[str, Any]:
@@ -32,6 +32,10 @@ def generate_id(user_id: int) -> str:
     return hashlib.sha256(f"{user_id}-{current_time}".encode()).hexdigest()[:16]
 
 
+# Timezone ``epodate`` formats dates in, including those stored in the database
+STORE_TIMEZONE = timezone(timedelta(hours=7))
+
+
 def epodate(epoch: int, store=False) -> str:
     """Convert Unix timestamp to formatted date string in GMT+7 timezone.
     
@@ -42,9 +46,7 @@ def epodate(epoch: int, store=False) -> str:
     Returns:
         Formatted date string
     """
-    tz_gmt7 = timezone(timedelta(hours=7))
-    
-    dt_gmt7 = datetime.fromtimestamp(epoch, tz_gmt7)
+    dt_gmt7 = datetime.fromtimestamp(epoch, STORE_TIMEZONE)
     
     fmt = "%Y-%m-%d %H:%M:%S" if store else "%A, %d %B %Y %H:%M:%S"
     return dt_gmt7.strftime(fmt)
@@ -106,6 +108,37 @@ def curtime(timezone: str):
     tz = pytz.timezone(timezone)
     return datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
 
+def time_period(time_range: str) -> Tuple[datetime, datetime]:
+    """Bounds of the current period of a history time range.
+
+    The periods are counted in ``STORE_TIMEZONE``, the timezone stored dates are written in,
+    so the bounds can be compared with stored columns as they are.
+
+    Args:
+        time_range: One of 'today', 'weekly', 'monthly' or 'yearly'
+
+    Returns:
+        The naive start (inclusive) and end (exclusive) of the current period
+    """
+    today = datetime.now(STORE_TIMEZONE).date()
+
+    if time_range == 'today':
+        start = today
+        end = start + timedelta(days=1)
+    elif time_range == 'weekly':
+        start = today - timedelta(days=today.weekday())
+        end = start + timedelta(days=7)
+    elif time_range == 'monthly':
+        start = today.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    elif time_range == 'yearly':
+        start = today.replace(month=1, day=1)
+        end = start.replace(year=start.year + 1)
+    else:
+        raise ValueError("Invalid time range. Use 'today', 'weekly', 'monthly', or 'yearly'.")
+
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())
+
 def search(s: str, p: str):
     pattern = re.compile(p)
     matches = pattern.search(s)